@@ -0,0 +1,88 @@
+import bisect
+import datetime
+
+
+def parse_anchor_seconds(time_str):
+    """把锚点的 'HH:MM:SS' 转换为当天的秒数"""
+    h, m, s = map(int, time_str.split(':'))
+    return h * 3600 + m * 60 + s
+
+
+class AnchorTimeline:
+    """今天锚点的增量模型 - 追加锚点为 O(1)，当前时间段通过游标查找"""
+
+    def __init__(self, start_of_day):
+        self.start_of_day = start_of_day
+
+        # 与锚点一一对应的预计算数据
+        self.seconds = []
+        self.events = []
+        # 已结束的环段（最后一个锚点仍在进行中，不在其中）
+        self.segments = []
+
+        # 当前时间段游标：[_cursor_start, _cursor_end) 内无需重新查找
+        self._cursor = None
+        self._cursor_start = 0
+        self._cursor_end = -1
+
+    def reset(self, anchors, start_of_day=None):
+        """由完整的锚点列表重建（加载数据或日期变化时调用）"""
+        if start_of_day is not None:
+            self.start_of_day = start_of_day
+        self.seconds = []
+        self.events = []
+        self.segments = []
+        self._invalidate_cursor()
+        for anchor in anchors:
+            self.append(anchor)
+
+    def append(self, anchor):
+        """追加一个锚点，只更新上一个时间段和新时间段"""
+        seconds = parse_anchor_seconds(anchor["time"])
+        index = len(self.seconds)
+
+        if self.events:
+            # 上一个时间段至此结束，成为一个静态环段
+            previous = self.events[-1]
+            previous["end_time"] = anchor["time"]
+            self.segments.append({
+                'start': self.start_of_day + datetime.timedelta(seconds=self.seconds[-1]),
+                'end': self.start_of_day + datetime.timedelta(seconds=seconds),
+                'color': None,  # 颜色由渲染器提供
+                'is_current': False
+            })
+
+        self.seconds.append(seconds)
+        self.events.append({
+            "start_time": anchor["time"],
+            "end_time": anchor["time"],  # 进行中的时间段，结束时间在查询时取当前时间
+            "event_name": anchor["event"],
+            "color_index": index % 20  # 20种颜色
+        })
+        self._invalidate_cursor()
+        return self.segments[-1] if index > 0 else None
+
+    def _invalidate_cursor(self):
+        self._cursor = None
+        self._cursor_start = 0
+        self._cursor_end = -1
+
+    def current_index(self, now_seconds):
+        """获取 now_seconds 所在时间段的索引，只在越过边界时重新查找"""
+        if self._cursor_start <= now_seconds < self._cursor_end:
+            return self._cursor
+
+        if not self.seconds or now_seconds < self.seconds[0]:
+            self._cursor = None
+            self._cursor_start = 0
+            self._cursor_end = self.seconds[0] if self.seconds else -1
+            return None
+
+        index = bisect.bisect_right(self.seconds, now_seconds) - 1
+        self._cursor = index
+        self._cursor_start = self.seconds[index]
+        self._cursor_end = self.seconds[index + 1] if index + 1 < len(self.seconds) else 86400
+        return index
+
+    def __len__(self):
+        return len(self.seconds)
@@ -1,16 +1,119 @@
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, State, Patch, no_update
+from flask import request, g, jsonify
 import plotly.graph_objects as go
+import os
+import time
 from datetime import datetime, timedelta
+from change_notifier import ChangeNotifier
 from data_manager import DataManager
+from day_columns import format_seconds
+from metrics import registry, timed
+from segment_cache import SegmentCache
 
 # 初始化Dash应用
 app = dash.Dash(__name__, suppress_callback_exceptions=True)
 app.title = "时间管理可视化"
 
+
+@app.server.route('/healthz')
+def healthz():
+    """健康检查，供时钟窗口判断应用是否已在运行"""
+    return 'ok'
+
 # 初始化数据管理器
 data_manager = DataManager()
 
+# 数据变化通知：时钟窗口推送 + 轮询今天的版本号（轮询线程由启动入口调用 start_notifier 启动）
+notifier = ChangeNotifier(data_manager)
+
+
+def start_notifier(debug=False):
+    """
+    启动数据变化的轮询线程
+
+    调试模式下 Dash 的重载器由父进程监视文件、子进程提供服务，只在子进程中启动。
+
+    Args:
+        debug: 是否以调试模式运行
+    """
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        notifier.start()
+
+
+@app.server.route('/notify', methods=['POST'])
+def notify():
+    """时钟窗口追加事件后调用，通知页面刷新变化的那一天"""
+    payload = request.get_json(silent=True) or {}
+    date = payload.get('date')
+    if not isinstance(date, str):
+        return 'missing date', 400
+    notifier.notify(date)
+    return 'ok'
+
+# 每天柱状图色段的缓存，过去的日期只在文件变化时重新计算
+segment_cache = SegmentCache()
+
+# 性能指标：回调耗时、缓存命中率、读取字节数和响应大小
+registry.register_source('data_cache', data_manager.get_cache_stats)
+registry.register_source('segment_cache', segment_cache.stats)
+registry.register_source('notifier', lambda: {'seq': notifier.seq})
+
+
+def is_local_request():
+    """指标接口只对本机开放"""
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+
+@app.server.before_request
+def start_dispatch_timer():
+    """记录 Dash 回调请求的开始时间"""
+    if request.path.endswith('/_dash-update-component'):
+        g.dispatch_start = time.perf_counter()
+
+
+@app.server.after_request
+def record_dispatch(response):
+    """记录 Dash 回调请求的总耗时（含图表 JSON 序列化）和响应大小"""
+    start = g.pop('dispatch_start', None)
+    if start is not None:
+        payload = request.get_json(silent=True) or {}
+        callback = app.callback_map.get(payload.get('output'), {}).get('callback')
+        name = getattr(callback, '__name__', 'unknown')
+        registry.observe(f"dispatch.{name}", (time.perf_counter() - start) * 1000)
+        if response.status_code == 200:
+            registry.observe_size(f"payload.{name}", response.calculate_content_length() or 0)
+    return response
+
+
+@app.server.route('/metrics')
+def metrics():
+    """导出性能指标（JSON）"""
+    if not is_local_request():
+        return 'forbidden', 403
+    return jsonify(registry.snapshot())
+
+
+@app.server.route('/metrics/profile/<name>', methods=['GET', 'POST', 'DELETE'])
+def metrics_profile(name):
+    """
+    采样分析开关：POST 为 name 的接下来 calls 次调用采样，DELETE 取消，GET 返回折叠栈
+    
+    例如：
+        curl -X POST 'http://127.0.0.1:8050/metrics/profile/callback.update_bar_chart?calls=5'
+        curl http://127.0.0.1:8050/metrics/profile/callback.update_bar_chart > bar.folded
+    """
+    if not is_local_request():
+        return 'forbidden', 403
+    if request.method == 'POST':
+        registry.profiler.arm(name, request.args.get('calls', 1, type=int),
+                              request.args.get('interval', 0.005, type=float))
+        return 'armed'
+    if request.method == 'DELETE':
+        registry.profiler.disarm(name)
+        return 'disarmed'
+    return registry.profiler.folded(name), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+
 # 统一配色方案，与clock_renderer.py一致
 COLOR_LIST = [
     '#40DE5A',  # 草绿
@@ -119,9 +222,15 @@ app.layout = html.Div([
 
     # 隐藏的存储组件
     dcc.Store(id='current-selected-date', data=datetime.now().strftime("%Y-%m-%d")),
+    # 只保存数据版本号和日期范围，数据本身留在服务端由 data_manager 按需读取
     dcc.Store(id='all-data', data={}),
     # 新增定时器组件，每10分钟刷新一次（600,000毫秒）
     dcc.Interval(id='clock-refresh', interval=600000, n_intervals=0),
+    # 每秒检查一次数据变化，没有变化时不更新任何组件
+    dcc.Interval(id='live-refresh', interval=1000, n_intervals=0),
+    dcc.Store(id='live-seq', data=None),
+    # 柱状图中今天的轨迹位置（位于末尾），今天有新事件时只替换这些轨迹
+    dcc.Store(id='bar-today-traces', data=None),
     
     # 状态栏
     html.Div([
@@ -145,123 +254,162 @@ def get_recent_dates(days):
     Output('all-data', 'data'),
     Input('days-dropdown', 'value')
 )
+@timed('callback.load_data')
 def load_data(days):
-    """加载数据"""
-    all_data = data_manager.load_all_data()
-    return all_data
+    """加载数据摘要（版本号与日期范围），不把全部历史数据发送到浏览器"""
+    return data_manager.get_data_summary()
+
+# 灰色：无数据 / 未到时间 / 未来
+EMPTY_COLOR = '#e0e0e0'
+
+def build_day_segments(date, columns, now_seconds=None, now=None):
+    """
+    计算某一天柱状图中的所有色段
+    
+    Args:
+        date: 日期字符串
+        columns: 该日期的 DayColumns，无数据时为 None
+        now_seconds: 今天的当前秒数，非今天为 None
+        now: 今天的当前时间字符串 'HH:MM:SS'
+        
+    Returns:
+        色段列表，每个元素为 (颜色, 高度小时数, 起点小时数, 悬停文本)
+    """
+    if not columns:
+        return [(EMPTY_COLOR, 24, 0, f"<b>{date}</b><br>暂无数据")]
+    
+    segments = []
+    # 列式数据：起止秒数与时长均为整型数组，无需再逐个解析时间字符串
+    starts = columns.starts.tolist()
+    ends = columns.ends.tolist()
+    durations = columns.durations.tolist()
+    names = columns.event_names
+    is_today = now_seconds is not None
+    for i in range(len(columns)):
+        start_sec = starts[i]
+        end_sec = ends[i]
+        duration = durations[i]
+        start_time = format_seconds(start_sec)
+        color = COLOR_LIST[i % len(COLOR_LIST)]
+        # 对当天，未到达的部分用灰色
+        if is_today and start_sec < now_seconds < end_sec:
+            # 已用部分
+            used = now_seconds - start_sec
+            if used > 0:
+                segments.append((color, used/3600, start_sec/3600,
+                                 f"<b>{date}</b><br>" +
+                                 f"时间: {start_time} - {now}\n" +
+                                 f"事件: {names[i]}"))
+            # 未用部分
+            left = end_sec - now_seconds
+            if left > 0:
+                segments.append((EMPTY_COLOR, left/3600, now_seconds/3600,
+                                 f"<b>{date}</b><br>未到时间"))
+            break
+        elif is_today and end_sec > now_seconds:
+            # 整段未到时间
+            segments.append((EMPTY_COLOR, duration/3600, start_sec/3600,
+                             f"<b>{date}</b><br>未到时间"))
+            break
+        else:
+            # 已过去的事件
+            segments.append((color, duration/3600, start_sec/3600,
+                             f"<b>{date}</b><br>" +
+                             f"时间: {start_time} - {format_seconds(end_sec)}<br>" +
+                             f"事件: {names[i]}<br>" +
+                             f"时长: {duration/3600:.2f}小时"))
+    if is_today:
+        # 计算当前时间到24:00:00的秒数
+        end_of_day_sec = 24 * 3600
+        left = end_of_day_sec - now_seconds
+        if left > 0:
+            segments.append((EMPTY_COLOR, left/3600, now_seconds/3600,
+                             f"<b>{date}</b><br>未来"))
+    return segments
+
+def build_bar_traces(day_segments):
+    """
+    把所有日期的色段按颜色合并为少量柱状图轨迹
+    
+    Args:
+        day_segments: 列表，每个元素为 (日期, 该日期的色段列表)
+        
+    Returns:
+        go.Bar 轨迹列表，每种颜色一条
+    """
+    groups = {}
+    for date, segments in day_segments:
+        for color, height, base, hover in segments:
+            group = groups.get(color)
+            if group is None:
+                group = groups[color] = ([], [], [], [])
+            group[0].append(date)
+            group[1].append(height)
+            group[2].append(base)
+            group[3].append(hover)
+    
+    return [
+        go.Bar(
+            x=x,
+            y=y,
+            base=base,
+            marker_color=color,
+            customdata=hover,
+            showlegend=False,
+            hovertemplate="%{customdata}<extra></extra>"
+        )
+        for color, (x, y, base, hover) in groups.items()
+    ]
+
+def build_today_traces(date):
+    """计算今天的柱状图轨迹（“已用 / 未到时间 / 未来”划分随时间变化，每次重新计算）"""
+    now = datetime.now().strftime('%H:%M:%S')
+    h, m, s = map(int, now.split(':'))
+    columns = data_manager.get_day_columns(date)
+    return build_bar_traces([(date, build_day_segments(date, columns, h * 3600 + m * 60 + s, now))])
 
 # 回调函数：更新柱状图
 @app.callback(
-    Output('bar-chart', 'figure'),
+    [Output('bar-chart', 'figure'),
+     Output('bar-today-traces', 'data')],
     [Input('all-data', 'data'),
      Input('days-dropdown', 'value')]
 )
-def update_bar_chart(all_data, days):
+@timed('callback.update_bar_chart')
+def update_bar_chart(data_summary, days):
     """更新柱状图"""
-    if not all_data:
-        return go.Figure()
+    if not data_summary or not data_summary.get('count'):
+        return go.Figure(), None
     
     # 获取最近days天的所有日期
     dates = get_recent_dates(days)
     # 横轴标签只显示月-日
     ticktext = [date[5:] for date in dates]
     
-    # 准备图表数据
-    fig = go.Figure()
+    today = datetime.now().strftime('%Y-%m-%d')
     
+    day_segments = []
     for date in dates:
-        events = data_manager.parse_time_events(date) if date in all_data else []
-        is_today = date == datetime.now().strftime('%Y-%m-%d')
-        now_seconds = None
-        if is_today:
-            now = datetime.now().strftime('%H:%M:%S')
-            h, m, s = map(int, now.split(':'))
-            now_seconds = h * 3600 + m * 60 + s
-        if not events:
-            fig.add_trace(go.Bar(
-                x=[date],
-                y=[24],
-                name="无数据",
-                marker_color='#e0e0e0',
-                showlegend=False,
-                hovertemplate=f"<b>{date}</b><br>暂无数据<extra></extra>"
-            ))
-        else:
-            for i, event in enumerate(events):
-                start_h, start_m, start_s = map(int, event['start_time'].split(':'))
-                end_h, end_m, end_s = map(int, event['end_time'].split(':'))
-                start_sec = start_h * 3600 + start_m * 60 + start_s
-                end_sec = end_h * 3600 + end_m * 60 + end_s
-                duration = end_sec - start_sec
-                # 对当天，未到达的部分用灰色
-                if is_today and now_seconds is not None and start_sec < now_seconds < end_sec:
-                    # 已用部分
-                    used = now_seconds - start_sec
-                    if used > 0:
-                        fig.add_trace(go.Bar(
-                            x=[date],
-                            y=[used/3600],
-                            name=event['event'],
-                            base=start_sec/3600,
-                            marker_color=COLOR_LIST[i % len(COLOR_LIST)],
-                            showlegend=False,
-                            hovertemplate=f"<b>{date}</b><br>" +
-                                         f"时间: {event['start_time']} - {now}\n" +
-                                         f"事件: {event['event']}<extra></extra>"
-                        ))
-                    # 未用部分
-                    left = end_sec - now_seconds
-                    if left > 0:
-                        fig.add_trace(go.Bar(
-                            x=[date],
-                            y=[left/3600],
-                            name='未到时间',
-                            base=now_seconds/3600,
-                            marker_color='#e0e0e0',
-                            showlegend=False,
-                            hovertemplate=f"<b>{date}</b><br>未到时间<extra></extra>"
-                        ))
-                    break
-                elif is_today and now_seconds is not None and end_sec > now_seconds:
-                    # 整段未到时间
-                    fig.add_trace(go.Bar(
-                        x=[date],
-                        y=[duration/3600],
-                        name='未到时间',
-                        base=start_sec/3600,
-                        marker_color='#e0e0e0',
-                        showlegend=False,
-                        hovertemplate=f"<b>{date}</b><br>未到时间<extra></extra>"
-                    ))
-                    break
-                else:
-                    # 已过去的事件
-                    fig.add_trace(go.Bar(
-                        x=[date],
-                        y=[duration/3600],
-                        name=event['event'],
-                        base=start_sec/3600,
-                        marker_color=COLOR_LIST[i % len(COLOR_LIST)],
-                        showlegend=False,
-                        hovertemplate=f"<b>{date}</b><br>" +
-                                     f"时间: {event['start_time']} - {event['end_time']}<br>" +
-                                     f"事件: {event['event']}<br>" +
-                                     f"时长: {duration/3600:.2f}小时<extra></extra>"
-                    ))
-            if is_today and now_seconds is not None:
-                # 计算当前时间到24:00:00的秒数
-                end_of_day_sec = 24 * 3600
-                left = end_of_day_sec - now_seconds
-                if left > 0:
-                    fig.add_trace(go.Bar(
-                        x=[date],
-                        y=[left/3600],
-                        name='未来',
-                        base=now_seconds/3600,
-                        marker_color='#e0e0e0',
-                        showlegend=False,
-                        hovertemplate=f"<b>{date}</b><br>未来<extra></extra>"
-                    ))
+        if date == today:
+            continue
+        
+        version = data_manager.get_day_version(date)
+        segments = segment_cache.get(date, version)
+        if segments is None:
+            columns = data_manager.get_day_columns(date)
+            segments = build_day_segments(date, columns)
+            segment_cache.put(date, version, segments)
+        day_segments.append((date, segments))
+    
+    # 所有色段合并为每种颜色一条轨迹，而不是每个事件一条；今天的轨迹单独放在末尾
+    traces = build_bar_traces(day_segments)
+    today_traces = None
+    if today in dates:
+        new_traces = build_today_traces(today)
+        today_traces = {'date': today, 'start': len(traces), 'count': len(new_traces)}
+        traces.extend(new_traces)
+    fig = go.Figure(data=traces)
+    
     # 更新布局
     fig.update_layout(
         #title="每日时间分布",
@@ -303,7 +451,7 @@ def update_bar_chart(all_data, days):
         title_font=dict(size=18, color='#222'),
         font=dict(color='#222', size=12)
     )
-    return fig
+    return fig, today_traces
 
 
 
@@ -314,7 +462,8 @@ def update_bar_chart(all_data, days):
      Input('all-data', 'data'),
      Input('clock-refresh', 'n_intervals')]
 )
-def update_clock_ring(selected_date, all_data, n_intervals):
+@timed('callback.update_clock_ring')
+def update_clock_ring(selected_date, data_summary, n_intervals):
     """更新表盘环形图"""
     from datetime import datetime, timedelta
     if not selected_date:
@@ -383,11 +532,52 @@ def update_clock_ring(selected_date, all_data, n_intervals):
     )
     return fig
 
+# 回调函数：推送数据变化
+@app.callback(
+    [Output('live-seq', 'data'),
+     Output('all-data', 'data', allow_duplicate=True),
+     Output('bar-chart', 'figure', allow_duplicate=True),
+     Output('bar-today-traces', 'data', allow_duplicate=True),
+     Output('clock-ring', 'figure', allow_duplicate=True)],
+    Input('live-refresh', 'n_intervals'),
+    [State('live-seq', 'data'),
+     State('bar-today-traces', 'data'),
+     State('current-selected-date', 'data')],
+    prevent_initial_call=True
+)
+@timed('callback.push_changes')
+def push_changes(n_intervals, seen_seq, today_traces, selected_date):
+    """只在数据变化时更新：今天变化时只替换今天的柱状图轨迹和表盘，其他变化整体刷新"""
+    if seen_seq is None:
+        # 页面刚加载，记下当前序号
+        return notifier.seq, no_update, no_update, no_update, no_update
+    
+    seq, changed = notifier.changes_since(seen_seq)
+    if not changed and changed is not None:
+        return no_update, no_update, no_update, no_update, no_update
+    
+    today = datetime.now().strftime('%Y-%m-%d')
+    if changed is None or changed != {today} or not today_traces or today_traces.get('date') != today:
+        # 过去的日期、新的一天或无法确定变化范围：更新数据摘要，所有视图随之刷新
+        return seq, data_manager.get_data_summary(), no_update, no_update, no_update
+    
+    # 删除旧的今天轨迹（位于末尾），追加重新计算的轨迹
+    patched = Patch()
+    for _ in range(today_traces['count']):
+        del patched['data'][today_traces['start']]
+    traces = build_today_traces(today)
+    patched['data'].extend([trace.to_plotly_json() for trace in traces])
+    today_traces = dict(today_traces, count=len(traces))
+    
+    ring = update_clock_ring(selected_date, None, n_intervals) if selected_date == today else no_update
+    return seq, no_update, patched, today_traces, ring
+
 # 回调函数：处理柱状图点击
 @app.callback(
     Output('current-selected-date', 'data'),
     [Input('bar-chart', 'clickData')]
 )
+@timed('callback.handle_bar_click')
 def handle_bar_click(click_data):
     """处理柱状图点击事件"""
     if click_data and click_data['points']:
@@ -401,10 +591,11 @@ def handle_bar_click(click_data):
     [Input('current-selected-date', 'data'),
      Input('all-data', 'data')]
 )
-def update_status_bar(selected_date, all_data):
+@timed('callback.update_status_bar')
+def update_status_bar(selected_date, data_summary):
     """更新状态栏信息"""
     date_display = f"当前选中日期：{selected_date}"
-    count_display = f"数据文件数量：{len(all_data) if all_data else 0}"
+    count_display = f"数据文件数量：{data_summary.get('count', 0) if data_summary else 0}"
     return date_display, count_display
 
 # 运行应用
@@ -417,4 +608,5 @@ if __name__ == '__main__':
     print(f"找到 {len(dates)} 个数据文件: {dates}")
     
     # 启动应用
+    start_notifier(debug=True)
     app.run(debug=True, host='127.0.0.1', port=8050) 
\ No newline at end of file
@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+from typing import Callable, Dict, Hashable, Optional
+
+
+def write_json_atomic(path: str, data, fsync: bool = True):
+    """
+    通过临时文件 + os.replace 原子地写入 JSON 文件
+
+    Args:
+        path: 目标文件路径
+        data: 要写入的数据
+        fsync: 替换前是否调用 fsync 落盘
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class BackgroundWriter:
+    """
+    后台写线程 - 调用方只入队，所有文件写入都在专用线程上按顺序执行
+
+    相同 key 的任务在执行前合并：已有该 key 尚未执行的任务时只替换要执行的函数，
+    因此连续多次保存同一个文件只会写一次。等待中的任务保存在不限长度的字典里，
+    submit 只做一次加锁的字典赋值，永远不会阻塞调用方（界面线程）。
+    """
+
+    def __init__(self):
+        # 键 -> 待执行的函数，按首次提交的顺序执行（合并不改变位置）
+        self._pending: Dict[Hashable, Callable[[], None]] = {}
+        self._cond = threading.Condition()
+        self._running = False
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="BackgroundWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, key: Hashable, fn: Callable[[], None]):
+        """
+        提交一个写任务，不会阻塞
+
+        Args:
+            key: 合并用的键，同一个 key 尚未执行的任务只保留最后一次提交的函数
+            fn: 在写线程上执行的无参函数
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._pending[key] = fn
+            self._cond.notify_all()
+
+    def write_json(self, path: str, data):
+        """
+        提交一次 JSON 文件的原子写入，同一路径尚未执行的写入只保留最新的数据
+
+        Args:
+            path: 目标文件路径
+            data: 要写入的数据（调用方不应再修改它）
+        """
+        self.submit(('write_json', path), lambda: write_json_atomic(path, data))
+
+    def _run(self):
+        """写线程主循环，关闭后执行完剩余的任务再退出"""
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                key = next(iter(self._pending))
+                fn = self._pending.pop(key)
+                self._running = True
+            try:
+                fn()
+            except Exception as e:
+                print(f"后台写入 {key} 时出错: {e}")
+            finally:
+                with self._cond:
+                    self._running = False
+                    self._cond.notify_all()
+
+    def flush(self):
+        """阻塞直到已提交的任务全部执行完"""
+        with self._cond:
+            while self._pending or self._running:
+                self._cond.wait()
+
+    def close(self, timeout: Optional[float] = None):
+        """
+        执行完已提交的任务后停止写线程
+
+        Args:
+            timeout: 最多等待的秒数，默认一直等待
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+时钟渲染器的离屏帧耗时测试
+
+使用 Qt 的 offscreen 平台，不创建窗口，直接驱动 ClockRenderer：
+对不同环段数、窗口大小和设备像素比的组合，分别测量几何计算、静态层重建
+（compute_geometry + render_static）和逐帧绘制（静态层贴图 + draw_dynamic_content）
+的耗时分位数，并统计缓存位图占用的内存。增量帧与窗口的定时器路径一致：advance_frame
+计算脏区域，只在脏区域内重绘（on_tick -> update(region) -> paintEvent）。
+可以用 --budget-ms 限定整帧和增量帧的 p99，超出时以非零状态退出，便于在持续集成中约束置顶窗口的 CPU 开销。
+
+用法示例：
+    python render_benchmark.py
+    python render_benchmark.py --segments 10 500 2000 --sizes 260x280 520x560 --dprs 1 2 --output render.json
+    python render_benchmark.py --budget-ms 4
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtCore import QSize
+from PyQt5.QtGui import QImage, QPainter
+from PyQt5.QtWidgets import QApplication
+
+from anchor_timeline import AnchorTimeline
+from clock_renderer import ClockRenderer
+
+# 逐帧测试固定使用的日期：环段属于前一天，全部已结束，都会画到静态层上
+FRAME_DATE = datetime.date(2025, 7, 4)
+
+
+def percentiles(samples):
+    """
+    计算耗时分位数
+
+    Args:
+        samples: 耗时列表（毫秒）
+
+    Returns:
+        包含 count、p50_ms、p90_ms、p99_ms、max_ms 的字典
+    """
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+    return {
+        'count': len(ordered),
+        'p50_ms': pick(0.50),
+        'p90_ms': pick(0.90),
+        'p99_ms': pick(0.99),
+        'max_ms': round(ordered[-1], 4),
+    }
+
+
+def build_timeline(segment_count):
+    """
+    构造有 segment_count 个已结束环段的时间线（锚点在一天内均匀分布）
+
+    Returns:
+        AnchorTimeline 实例
+    """
+    start_of_day = datetime.datetime.combine(FRAME_DATE - datetime.timedelta(days=1), datetime.time())
+    step = 86400 // (segment_count + 1)
+    anchors = [
+        {'time': f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}", 'event': f"事件{i % 20}"}
+        for i, s in enumerate(range(0, step * (segment_count + 1), step))
+    ]
+    timeline = AnchorTimeline(start_of_day)
+    timeline.reset(anchors)
+    return timeline
+
+
+def pixmap_bytes(pixmap):
+    """位图占用的字节数（未生成时为 0）"""
+    if pixmap is None or pixmap.isNull():
+        return 0
+    return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+
+def region_area(region):
+    """区域覆盖的像素数（逻辑坐标）"""
+    return sum(rect.width() * rect.height() for rect in region.rects())
+
+
+def run_case(segment_count, size, dpr, frames, rebuilds, input_height):
+    """
+    测试一种组合
+
+    Args:
+        segment_count: 静态环段数
+        size: 逻辑窗口大小 (宽, 高)
+        dpr: 设备像素比
+        frames: 逐帧绘制的帧数（每帧时间前进一秒）
+        rebuilds: 静态层重建的次数
+        input_height: 输入框高度
+
+    Returns:
+        该组合的结果字典
+    """
+    width, height = size
+    renderer = ClockRenderer()
+    timeline = build_timeline(segment_count)
+    segments = timeline.segments
+    qsize = QSize(width, height)
+
+    geometry, rebuild = [], []
+    for _ in range(rebuilds):
+        start = time.perf_counter()
+        renderer.compute_geometry(width, height, input_height)
+        geometry.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        renderer.render_static(qsize, segments)
+        rebuild.append((time.perf_counter() - start) * 1000)
+
+    # 与窗口的后备缓冲区一致：物理像素大小，按设备像素比缩放绘制
+    target = QImage(int(width * dpr), int(height * dpr), QImage.Format_ARGB32_Premultiplied)
+    target.setDevicePixelRatio(dpr)
+
+    # 进行中的时间段从最后一个锚点开始，帧时间在其后逐秒推进
+    now = datetime.datetime.combine(FRAME_DATE, datetime.time()) + datetime.timedelta(seconds=timeline.seconds[-1])
+    frame_times = []
+    for i in range(frames):
+        frame_now = now + datetime.timedelta(seconds=i)
+        index = timeline.current_index(frame_now.hour * 3600 + frame_now.minute * 60 + frame_now.second)
+        start = time.perf_counter()
+        painter = QPainter(target)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.drawPixmap(0, 0, renderer.render_static(qsize, segments))
+        renderer.draw_dynamic_content(painter, timeline.seconds, index, frame_now)
+        painter.end()
+        frame_times.append((time.perf_counter() - start) * 1000)
+
+    # 增量帧：与 ClockWindow.on_tick 相同，推进一帧后只在脏区域内重绘；返回 None 时整窗重绘
+    incremental_times = []
+    full_repaints = 0
+    dirty_pixels = 0
+    for i in range(frames):
+        frame_now = now + datetime.timedelta(seconds=i)
+        index = timeline.current_index(frame_now.hour * 3600 + frame_now.minute * 60 + frame_now.second)
+        start = time.perf_counter()
+        region = renderer.advance_frame(timeline.seconds, index, frame_now)
+        if region is None or not region.isEmpty():
+            painter = QPainter(target)
+            painter.setRenderHint(QPainter.Antialiasing)
+            if region is not None:
+                painter.setClipRegion(region)
+            painter.drawPixmap(0, 0, renderer.render_static(qsize, segments))
+            renderer.draw_frame(painter, timeline.seconds, index)
+            painter.end()
+        incremental_times.append((time.perf_counter() - start) * 1000)
+        if region is None:
+            full_repaints += 1
+            dirty_pixels += width * height
+        else:
+            dirty_pixels += region_area(region)
+
+    cache_bytes = pixmap_bytes(renderer._background_pixmap) + pixmap_bytes(renderer._static_pixmap)
+    return {
+        'segments': segment_count,
+        'size': f"{width}x{height}",
+        'dpr': dpr,
+        'compute_geometry': percentiles(geometry),
+        'render_static': percentiles(rebuild),
+        'frame': percentiles(frame_times),
+        'incremental': percentiles(incremental_times),
+        'full_repaints': full_repaints,
+        'dirty_ratio': round(dirty_pixels / (frames * width * height), 4),
+        'pixmap_bytes': cache_bytes,
+        'backbuffer_bytes': target.sizeInBytes(),
+    }
+
+
+def parse_size(text):
+    """解析 '宽x高' 格式的窗口大小"""
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def print_table(results):
+    """以表格形式输出结果"""
+    print(f"{'环段':>6} {'窗口':>9} {'DPR':>5} {'重建p50':>10} {'帧p50':>9} {'帧p99':>9} {'帧max':>9}"
+          f" {'增量p50':>9} {'增量p99':>9} {'脏区比例':>8} {'缓存KB':>9}")
+    for r in results:
+        print(f"{r['segments']:>8} {r['size']:>11} {r['dpr']:>6} {r['render_static']['p50_ms']:>12.3f}"
+              f" {r['frame']['p50_ms']:>10.3f} {r['frame']['p99_ms']:>10.3f} {r['frame']['max_ms']:>10.3f}"
+              f" {r['incremental']['p50_ms']:>11.3f} {r['incremental']['p99_ms']:>11.3f} {r['dirty_ratio']:>12.3f}"
+              f" {(r['pixmap_bytes'] + r['backbuffer_bytes']) / 1024:>11.1f}")
+
+
+def main(argv=None):
+    """主函数"""
+    parser = argparse.ArgumentParser(description="时钟渲染器离屏帧耗时测试")
+    parser.add_argument("--segments", type=int, nargs='+', default=[10, 100, 500, 2000], help="静态环段数")
+    parser.add_argument("--sizes", nargs='+', default=['260x280', '400x430', '800x860'], help="窗口大小，格式为 宽x高")
+    parser.add_argument("--dprs", type=float, nargs='+', default=[1.0, 1.5, 2.0], help="设备像素比")
+    parser.add_argument("--frames", type=int, default=120, help="每种组合绘制的帧数")
+    parser.add_argument("--rebuilds", type=int, default=5, help="每种组合重建静态层的次数")
+    parser.add_argument("--input-height", type=int, default=30, help="输入框高度")
+    parser.add_argument("--budget-ms", type=float, help="整帧和增量帧 p99 的上限，任一组合超出时返回非零状态")
+    parser.add_argument("--output", help="结果 JSON 文件")
+    args = parser.parse_args(argv)
+
+    qt_app = QApplication.instance() or QApplication([])
+
+    results = []
+    for segment_count in args.segments:
+        for size in args.sizes:
+            for dpr in args.dprs:
+                results.append(run_case(segment_count, parse_size(size), dpr,
+                                        args.frames, args.rebuilds, args.input_height))
+    print_table(results)
+
+    if args.output:
+        report = {
+            'meta': {
+                'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+                'platform': qt_app.platformName(),
+                'frames': args.frames,
+                'rebuilds': args.rebuilds,
+                'budget_ms': args.budget_ms,
+            },
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+
+    if args.budget_ms is not None:
+        over = [(r, kind) for r in results for kind in ('frame', 'incremental')
+                if r[kind]['p99_ms'] > args.budget_ms]
+        for r, kind in over:
+            print(f"超出预算: {r['segments']} 个环段, {r['size']}, DPR {r['dpr']}, {kind}: "
+                  f"p99 {r[kind]['p99_ms']:.3f} ms > {args.budget_ms} ms")
+        if over:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
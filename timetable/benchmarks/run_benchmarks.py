@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能基准测试
+
+在合成历史数据上测量数据读取、Dash 回调（直接调用）和时钟控制器预计算的耗时，
+结果以 JSON 输出，可以用 --compare 与之前提交的结果对比。
+
+用法示例：
+    python run_benchmarks.py --years 3 --output results.json
+    python run_benchmarks.py --output new.json --compare results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from generate_history import generate_history
+
+
+def measure(fn, repeats, setup=None):
+    """
+    多次执行 fn 并统计耗时
+
+    Args:
+        fn: 被测函数
+        repeats: 执行次数
+        setup: 每次执行前调用（不计入耗时），例如清空缓存
+
+    Returns:
+        包含 repeats、min_ms、median_ms、mean_ms、max_ms 的字典
+    """
+    samples = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'repeats': repeats,
+        'min_ms': round(min(samples), 4),
+        'median_ms': round(statistics.median(samples), 4),
+        'mean_ms': round(statistics.mean(samples), 4),
+        'max_ms': round(max(samples), 4),
+    }
+
+
+def count_bar_segments(figure):
+    """柱状图中有数据的色段数（不含“暂无数据”的占位柱）"""
+    return sum(1 for trace in figure.data for hover in (trace.customdata or ()) if '暂无数据' not in hover)
+
+
+def git_commit():
+    """当前提交的哈希，不在 git 仓库中时返回 None"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=BENCH_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(data_dir, repeats, bar_days, controller_anchors):
+    """
+    执行全部基准测试
+
+    Args:
+        data_dir: 合成数据目录
+        repeats: 每项的执行次数
+        bar_days: 柱状图显示的天数
+        controller_anchors: 时钟控制器预计算使用的锚点数
+
+    Returns:
+        {测试名: 统计结果}
+    """
+    # 可视化应用和时钟窗口都从统一的数据根目录读取，必须在导入前设置
+    os.environ['TIMETABLE_DATA_DIR'] = data_dir
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    from data_manager import DataManager
+    import app
+
+    results = {}
+    dates = DataManager(data_dir).get_all_dates()
+    recent = dates[-bar_days:]
+
+    # 数据读取：冷启动（新的数据管理器，缓存为空）与缓存命中
+    results['get_all_dates'] = measure(lambda: DataManager(data_dir).get_all_dates(), repeats)
+    results['load_all_data.cold'] = measure(lambda: DataManager(data_dir).load_all_data(), repeats)
+    warm = DataManager(data_dir)
+    warm.load_all_data()
+    results['load_all_data.warm'] = measure(warm.load_all_data, repeats)
+    results['parse_time_events.recent'] = measure(
+        lambda: [warm.parse_time_events(date) for date in recent], repeats)
+
+    # Dash 回调直接调用
+    app.data_manager = warm
+    summary = warm.get_data_summary()
+    # 柱状图按日历从今天往前数，数据没有覆盖最近几天时测到的只是占位柱
+    figure, _ = app.update_bar_chart(summary, bar_days)
+    if not count_bar_segments(figure):
+        raise RuntimeError(f"最近 {bar_days} 天没有数据，柱状图中只有占位柱，测得的耗时没有意义")
+    results['update_bar_chart.cold'] = measure(lambda: app.update_bar_chart(summary, bar_days), repeats,
+                                               setup=app.segment_cache.clear)
+    app.update_bar_chart(summary, bar_days)
+    results['update_bar_chart.warm'] = measure(lambda: app.update_bar_chart(summary, bar_days), repeats)
+    results['update_clock_ring'] = measure(lambda: app.update_clock_ring(dates[-1], summary, 0), repeats)
+
+    # 时钟控制器：由完整锚点列表重建预计算数据
+    from PyQt5.QtWidgets import QApplication
+    qt_app = QApplication.instance() or QApplication([])
+    from clock_widget import ClockWindow
+    window = ClockWindow()
+    controller = window.controller
+    step = 86400 // max(1, controller_anchors)
+    controller.anchors = [
+        {'time': f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}", 'event': f"事件{i % 50}"}
+        for i, s in enumerate(range(0, step * controller_anchors, step))
+    ]
+    results['precompute_anchor_data'] = measure(controller.precompute_anchor_data, repeats)
+    controller.storage.flush()
+    window.close()
+    qt_app.processEvents()
+
+    return results
+
+
+def compare(results, baseline_path):
+    """打印与之前结果的中位数对比"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    print(f"\n与 {baseline_path} 对比（中位数）：")
+    for name, stats in results.items():
+        old = baseline.get(name)
+        if old is None:
+            print(f"  {name:<28} {stats['median_ms']:>10.3f} ms  （新增）")
+            continue
+        ratio = stats['median_ms'] / old['median_ms'] if old['median_ms'] else float('inf')
+        print(f"  {name:<28} {old['median_ms']:>10.3f} -> {stats['median_ms']:>10.3f} ms  x{ratio:.2f}")
+
+
+def main(argv=None):
+    """主函数"""
+    parser = argparse.ArgumentParser(description="时间管理应用性能基准测试")
+    parser.add_argument("--data-dir", help="使用已有数据目录的副本，默认生成临时的合成数据")
+    parser.add_argument("--years", type=float, default=3, help="合成数据的年数")
+    parser.add_argument("--anchors", type=int, default=40, help="合成数据每天锚点数的平均值")
+    parser.add_argument("--events", type=int, default=200, help="合成数据中不同事件名的个数")
+    parser.add_argument("--seed", type=int, default=20250704, help="合成数据的随机种子")
+    parser.add_argument("--repeats", type=int, default=5, help="每项的执行次数")
+    parser.add_argument("--bar-days", type=int, default=30, help="柱状图显示的天数")
+    parser.add_argument("--controller-anchors", type=int, default=500, help="时钟控制器预计算的锚点数")
+    parser.add_argument("--output", help="结果 JSON 文件，默认输出到标准输出")
+    parser.add_argument("--compare", help="与之前的结果 JSON 对比")
+    args = parser.parse_args(argv)
+
+    params = {key: getattr(args, key) for key in
+              ('years', 'anchors', 'events', 'seed', 'repeats', 'bar_days', 'controller_anchors')}
+
+    # 总是在临时目录中运行：时钟窗口会写入今天的数据文件，不能污染已有的数据目录
+    tmp_dir = tempfile.mkdtemp(prefix="timetable_bench_")
+    data_dir = os.path.join(tmp_dir, "time_data")
+    try:
+        if args.data_dir is None:
+            generate_history(data_dir, int(args.years * 365), args.anchors, args.events,
+                             end_date=date.today(), seed=args.seed)
+        else:
+            shutil.copytree(args.data_dir, data_dir)
+        results = run(data_dir, args.repeats, args.bar_days, args.controller_anchors)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'data_dir': args.data_dir,
+            'params': params,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
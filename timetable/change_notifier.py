@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional, Set, Tuple
+
+
+class ChangeNotifier:
+    """
+    数据变化通知 - 给每次数据变化一个递增的序号，供可视化应用的定时回调廉价地判断是否需要刷新
+
+    变化来源有两个：时钟窗口追加事件后 POST /notify，以及后台线程轮询今天的版本号
+    （每次只需一次 os.stat，覆盖窗口未运行可视化应用或通知失败的情况）。
+    """
+
+    def __init__(self, data_manager, poll_interval: float = 0.5, history: int = 256):
+        """
+        初始化变化通知
+
+        Args:
+            data_manager: DataManager 实例，用于读取每天的版本号
+            poll_interval: 轮询今天版本号的间隔（秒）
+            history: 保留的最近变化条数，落后更多的客户端需要整体刷新
+        """
+        self.data_manager = data_manager
+        self.poll_interval = poll_interval
+
+        self.seq = 0
+        self._changes = deque(maxlen=history)  # (序号, 日期)
+        self._counters: Dict[str, int] = {}    # 每天最近一次看到的版本号
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def notify(self, date: str):
+        """
+        记录某一天发生了变化
+
+        Args:
+            date: 日期字符串，格式为 'YYYY-MM-DD'
+        """
+        # 同时记下当前版本号，轮询线程不会再为同一次写入重复通知
+        counter = self.data_manager.get_day_counter(date)
+        with self._lock:
+            self._counters[date] = counter
+            self._push(date)
+
+    def _push(self, date: str):
+        """记录一次变化（调用方持有 _lock）"""
+        self.seq += 1
+        self._changes.append((self.seq, date))
+
+    def changes_since(self, seq: int) -> Tuple[int, Optional[Set[str]]]:
+        """
+        获取序号 seq 之后发生变化的日期
+
+        Args:
+            seq: 客户端上次看到的序号
+
+        Returns:
+            (当前序号, 变化的日期集合)；历史已被丢弃无法确定时日期集合为 None
+        """
+        with self._lock:
+            if seq == self.seq:
+                return seq, set()
+            if seq > self.seq or not self._changes or self._changes[0][0] > seq + 1:
+                # 服务重启或客户端落后太多
+                return self.seq, None
+            return self.seq, {date for change_seq, date in self._changes if change_seq > seq}
+
+    def check(self):
+        """检查今天的版本号，变化时记录一次通知"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        counter = self.data_manager.get_day_counter(today)
+        with self._lock:
+            previous = self._counters.get(today)
+            self._counters[today] = counter
+            if previous is not None and counter != previous:
+                self._push(today)
+
+    def start(self):
+        """启动轮询线程（重复调用无效）"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="ChangeNotifier", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """轮询线程主循环"""
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                print(f"检查数据变化时出错: {e}")
+            time.sleep(self.poll_interval)
@@ -1,14 +1,11 @@
 from PyQt5.QtCore import QTimer, QPoint, Qt, QRectF
 from PyQt5.QtWidgets import QLabel
-import math
 import datetime
-import json
-import os
-import bisect
-import subprocess
-import sys
-import webbrowser
-import time
+
+from anchor_timeline import AnchorTimeline
+from dashboard_launcher import DashboardLauncher
+from hit_test import PolarHitTable
+from storage import get_engine
 
 class ClockController:
     """时钟交互控制器 - 专门负责所有交互和数据管理逻辑"""
@@ -16,17 +13,25 @@ class ClockController:
     def __init__(self, widget):
         self.widget = widget
         
-        # 数据管理
-        self.data_dir = "time_data"
-        os.makedirs(self.data_dir, exist_ok=True)
+        # 数据管理：与可视化应用共用统一的存储引擎和数据根目录
+        self.storage = get_engine()
+        self.data_dir = self.storage.data_dir
         self.today = datetime.date.today().isoformat()
         self.start_of_day = datetime.datetime.combine(datetime.date.today(), datetime.time(0, 0, 0))
         self.anchors = []
         
-        # 预计算数据
-        self.anchor_seconds = []
-        self.anchor_events = []
-        self._anchor_segments = []
+        # 追加写日志模式：新锚点追加到日志，由后台合并回快照文件
+        # 所有文件写入都在存储引擎的写线程上执行，界面线程只入队
+        self.use_journal = True
+        
+        # 预计算数据（增量维护的锚点模型）
+        self.timeline = AnchorTimeline(self.start_of_day)
+        self.anchor_seconds = self.timeline.seconds
+        self.anchor_events = self.timeline.events
+        self._anchor_segments = self.timeline.segments
+        
+        # 悬停命中表（几何由窗口在计算几何后设置）
+        self.hit_table = PolarHitTable()
         
         # 交互状态
         self.dragging = False
@@ -54,15 +59,10 @@ class ClockController:
         )
         self.hover_label.hide()
         
-        # 定时器
-        self.hover_timer = QTimer(widget)
-        self.hover_timer.setSingleShot(True)
-        self.hover_timer.timeout.connect(self._do_hover_detection)
-        
-        self.global_hover_timer = QTimer(widget)
-        self.global_hover_timer.timeout.connect(self._check_hover_state)
-        self.global_hover_timer.start(200)
+        # 可视化应用启动器
+        self.dashboard = DashboardLauncher()
         
+        # 定时器
         self.date_check_timer = QTimer(widget)
         self.date_check_timer.timeout.connect(self._check_date_change)
         self.date_check_timer.start(60000)
@@ -72,60 +72,32 @@ class ClockController:
     
     def load_anchors(self):
         """加载锚点数据"""
-        path = self.get_today_file()
-        self.anchors = []
-        if os.path.exists(path):
-            with open(path, 'r', encoding='utf-8') as f:
-                self.anchors = json.load(f)
+        # 缓存中的列表与可视化共享，复制后再追加
+        self.anchors = list(self.storage.load_day(self.today))
         if not self.anchors:
             self.anchors.append({"time": self.start_of_day.strftime("%H:%M:%S"), "event": "未命名"})
             self.save_anchors()
         self.precompute_anchor_data()
     
     def save_anchors(self):
-        """保存锚点数据"""
-        path = self.get_today_file()
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(self.anchors, f, ensure_ascii=False, indent=2)
+        """保存锚点数据（在写线程上原子写入，连续保存只写最后一次）"""
+        self.storage.save_day_async(self.today, list(self.anchors))
     
     def get_today_file(self):
         """获取今天的数据文件路径"""
-        return os.path.join(self.data_dir, f"timedata_{self.today}.json")
+        return self.storage.get_day_file(self.today)
     
     def precompute_anchor_data(self):
-        """预计算锚点数据和环段几何"""
-        self.anchor_seconds = []
-        self.anchor_events = []
-        self._anchor_segments = []
-        
-        for i, anchor in enumerate(self.anchors):
-            h, m, s = map(int, anchor["time"].split(':'))
-            seconds = h * 3600 + m * 60 + s
-            self.anchor_seconds.append(seconds)
-            
-            start_time = anchor["time"]
-            if i + 1 < len(self.anchors):
-                end_time = self.anchors[i + 1]["time"]
-            else:
-                end_time = datetime.datetime.now().strftime("%H:%M:%S")
-            
-            self.anchor_events.append({
-                "start_time": start_time,
-                "end_time": end_time,
-                "event_name": anchor["event"],
-                "color_index": i % 20  # 20种颜色
-            })
-            
-            # 预计算环段几何数据
-            if i + 1 < len(self.anchors):
-                start_dt = datetime.datetime.strptime(start_time, "%H:%M:%S")
-                end_dt = datetime.datetime.strptime(end_time, "%H:%M:%S")
-                self._anchor_segments.append({
-                    'start': start_dt,
-                    'end': end_dt,
-                    'color': None,  # 颜色由渲染器提供
-                    'is_current': False
-                })
+        """预计算锚点数据和环段几何（完整重建，仅在加载数据时调用）"""
+        self.timeline.reset(self.anchors, self.start_of_day)
+        self.anchor_seconds = self.timeline.seconds
+        self.anchor_events = self.timeline.events
+        self._anchor_segments = self.timeline.segments
+        self.hit_table.reset(self.anchor_seconds)
+    
+    def update_hit_geometry(self):
+        """窗口几何变化后重建命中表的半径带"""
+        self.hit_table.set_geometry(self.widget.renderer.get_ring_bounds())
     
     def add_event(self, event_name):
         """添加新事件"""
@@ -136,30 +108,23 @@ class ClockController:
             event_name = event_name.strip()
         
         now = datetime.datetime.now().strftime("%H:%M:%S")
-        self.anchors.append({"time": now, "event": event_name})
-        self.save_anchors()
-        self.precompute_anchor_data()
+        anchor = {"time": now, "event": event_name}
+        self.anchors.append(anchor)
+        if self.use_journal:
+            self.storage.append_event(self.today, anchor)
+        else:
+            self.save_anchors()
+        # 写入之后通知可视化应用：写线程只把通知交给启动器的通知线程，不等待网络请求
+        date = self.today
+        self.storage.writer.submit(('notify', date), lambda: self.dashboard.notify_async(date))
+        self.timeline.append(anchor)
+        self.hit_table.append(self.anchor_seconds[-1])
         return True
     
     def get_current_segment_index(self):
         """获取当前时间段的索引"""
-        if not self.anchors:
-            return None
-            
         now = datetime.datetime.now()
-        current_time = now.time()
-        
-        for i, anchor in enumerate(self.anchors):
-            start_time = datetime.datetime.strptime(anchor["time"], "%H:%M:%S").time()
-            
-            if i + 1 < len(self.anchors):
-                end_time = datetime.datetime.strptime(self.anchors[i + 1]["time"], "%H:%M:%S").time()
-                if start_time <= current_time < end_time:
-                    return i
-            else:
-                if start_time <= current_time:
-                    return i
-        return None
+        return self.timeline.current_index(now.hour * 3600 + now.minute * 60 + now.second)
     
     def get_anchor_segments(self):
         """获取锚点环段数据"""
@@ -169,6 +134,10 @@ class ClockController:
         """获取锚点数据"""
         return self.anchors
     
+    def get_anchor_seconds(self):
+        """获取每个锚点当天的秒数"""
+        return self.anchor_seconds
+    
     def handle_mouse_press(self, event):
         """处理鼠标按下事件"""
         if event.button() == Qt.LeftButton:
@@ -203,16 +172,10 @@ class ClockController:
                 pos = event.pos()
                 self.last_mouse_pos = pos
                 
-                if self._is_in_ring(pos):
+                if self.hit_table.in_ring(pos.x(), pos.y()):
                     global_pos = self.widget.mapToGlobal(pos + QPoint(15, -15))
                     self.hover_label.move(global_pos)
-                    
-                    if not self.hover_timer.isActive():
-                        self.hover_timer.start(50)
-                else:
-                    self.hover_label.hide()
-                    self.last_hover_text = ""
-                    self.hover_timer.stop()
+                self._do_hover_detection()
             return "hover"
     
     def _is_menu_button_clicked(self, pos):
@@ -242,51 +205,17 @@ class ClockController:
         
         return x_rect.contains(pos)
     
-    def _is_in_ring(self, pos):
-        """检查鼠标是否在圆环区域内"""
-        bounds = self.widget.renderer.get_ring_bounds()
-        center = bounds['center']
-        
-        mouse_x, mouse_y = pos.x(), pos.y()
-        distance = math.sqrt((mouse_x - center.x())**2 + (mouse_y - center.y())**2)
-        
-        inner_ring_outer = bounds['inner_ring_outer']
-        outer_ring_outer = bounds['outer_ring_outer']
-        
-        return (bounds['radius'] - 5 <= distance <= inner_ring_outer + 5 or 
-                inner_ring_outer - 2 < distance <= outer_ring_outer + 5)
-    
     def _do_hover_detection(self):
-        """悬停检测处理"""
+        """悬停检测处理：命中表换算出时间后查表得到事件"""
         if not self.last_mouse_pos:
             return
             
         pos = self.last_mouse_pos
+        target_seconds = self.hit_table.target_seconds(pos.x(), pos.y())
         
-        if not self._is_in_ring(pos):
-            self.hover_label.hide()
-            self.last_hover_text = ""
-            return
-        
-        angle = self._calc_angle(pos)
-        is_afternoon = self._is_afternoon_ring(pos)
-        
-        if is_afternoon:
-            target_seconds = int((angle / 360) * 43200) + 43200
-        else:
-            target_seconds = int((angle / 360) * 43200)
-        
-        # 检查目标时间是否已经过去
-        now = datetime.datetime.now()
-        current_seconds = (now - self.start_of_day).total_seconds()
-        
-        # 如果目标时间在未来，不显示标签
-        if target_seconds > current_seconds:
-            self.hover_label.hide()
-            self.last_hover_text = ""
-            return
-        
-        event_info = self._find_event_at_seconds(target_seconds)
+        event_info = None
+        if target_seconds >= 0:
+            event_info = self._find_event_at_seconds(target_seconds)
         
         new_text = ""
         if event_info:
@@ -300,63 +229,22 @@ class ClockController:
                 self.hover_label.hide()
             self.last_hover_text = new_text
     
-    def _calc_angle(self, pos):
-        """计算鼠标位置对应的角度"""
-        bounds = self.widget.renderer.get_ring_bounds()
-        center = bounds['center']
-        
-        dx = pos.x() - center.x()
-        dy = pos.y() - center.y()
-        angle = math.degrees(math.atan2(-dy, -dx))
-        return (angle + 270) % 360
-    
-    def _is_afternoon_ring(self, pos):
-        """判断是否在外环（下午时间）"""
-        bounds = self.widget.renderer.get_ring_bounds()
-        center = bounds['center']
-        
-        mouse_x, mouse_y = pos.x(), pos.y()
-        distance = math.sqrt((mouse_x - center.x())**2 + (mouse_y - center.y())**2)
-        
-        inner_ring_outer = bounds['inner_ring_outer']
-        outer_ring_outer = bounds['outer_ring_outer']
-        
-        return inner_ring_outer + 2 < distance <= outer_ring_outer + 2
-    
     def _find_event_at_seconds(self, target_seconds):
-        """使用二分查找快速定位事件"""
-        if not self.anchor_seconds:
+        """通过命中表定位事件"""
+        idx = self.hit_table.index_at(target_seconds)
+        if idx < 0:
             return None
         
-        # 获取当前时间
+        # 如果目标时间在未来，返回None
         now = datetime.datetime.now()
         current_seconds = (now - self.start_of_day).total_seconds()
-        
-        # 如果目标时间在未来，返回None
         if target_seconds > current_seconds:
             return None
-            
-        # 特别处理第一个事件（00:00:00开始）
-        if target_seconds <= self.anchor_seconds[0]:
-            return self.anchor_events[0]
-            
-        idx = bisect.bisect_right(self.anchor_seconds, target_seconds) - 1
         
-        if idx >= 0:
-            return self.anchor_events[idx]
-        else:
-            # 如果找不到匹配的事件，返回第一个事件作为默认
-            return self.anchor_events[0] if self.anchor_events else None
-    
-    def _check_hover_state(self):
-        """检查悬停状态"""
-        if not self.last_mouse_pos:
-            return
-            
-        if not self._is_in_ring(self.last_mouse_pos):
-            self.hover_label.hide()
-            self.last_hover_text = ""
-            self.hover_timer.stop()
+        if idx == len(self.anchor_events) - 1:
+            # 进行中的时间段，结束时间为当前时间
+            return dict(self.anchor_events[idx], end_time=now.strftime("%H:%M:%S"))
+        return self.anchor_events[idx]
     
     def _check_date_change(self):
         """检查日期变化"""
@@ -364,6 +252,9 @@ class ClockController:
         if current_date != self.today:
             print(f"日期已变化：{self.today} -> {current_date}，正在刷新数据...")
             
+            # 旧日期的日志立即在写线程上合并
+            self.storage.close_journal(self.today)
+            
             self.today = current_date
             self.start_of_day = datetime.datetime.combine(datetime.date.today(), datetime.time(0, 0, 0))
             
@@ -374,37 +265,16 @@ class ClockController:
             
             self.hover_label.hide()
             self.last_hover_text = ""
-            self.hover_timer.stop()
             
             print(f"数据刷新完成，新文件：{self.get_today_file()}")
     
     def run_time_manage(self):
-        """运行时间管理可视化应用"""
-        try:
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            run_app_path = os.path.join(current_dir, "run_app.py")
-            
-            if os.path.exists(run_app_path):
-                if os.name == 'nt':
-                    process = subprocess.Popen([sys.executable, run_app_path], 
-                                             cwd=current_dir,
-                                             creationflags=subprocess.CREATE_NO_WINDOW)
-                else:
-                    process = subprocess.Popen([sys.executable, run_app_path], 
-                                             cwd=current_dir,
-                                             stdout=subprocess.DEVNULL,
-                                             stderr=subprocess.DEVNULL)
-                
-                time.sleep(2)
-                
-                try:
-                    webbrowser.open('http://127.0.0.1:8050', new=0, autoraise=True)
-                except Exception:
-                    pass
-            else:
-                pass
-        except Exception:
-            pass
+        """打开时间管理可视化应用（不阻塞界面）"""
+        self.dashboard.open()
+    
+    def flush_journal(self):
+        """退出前把日志合并回快照文件，并等待写线程写完所有数据"""
+        self.storage.flush()
     
     def handle_leave_event(self):
         """处理鼠标离开事件"""
@@ -414,5 +284,4 @@ class ClockController:
     def handle_enter_event(self, event):
         """处理鼠标进入事件"""
         self.last_mouse_pos = event.pos()
-        if not self.hover_timer.isActive():
-            self.hover_timer.start(50) 
\ No newline at end of file
+        self._do_hover_detection() 
\ No newline at end of file
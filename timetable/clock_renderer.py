@@ -1,5 +1,5 @@
-from PyQt5.QtCore import QPoint, QRectF, Qt
-from PyQt5.QtGui import QPainter, QColor, QPen, QPixmap
+from PyQt5.QtCore import QPoint, QRect, QRectF, Qt
+from PyQt5.QtGui import QPainter, QColor, QPen, QPixmap, QPolygon, QRegion
 import math
 import datetime
 
@@ -43,9 +43,14 @@ class ClockRenderer:
         # 几何参数
         self.ring_width_ratio = 0.15
         
-        # 缓存
+        # 缓存：背景层（窗口背景、表盘、刻度、按钮）+ 静态层（背景层 + 已结束的环段）
+        self._background_pixmap = None
+        self._need_background_update = True
         self._static_pixmap = None
         self._need_static_update = True
+        
+        # 上一帧动态内容的状态，用于计算脏区域
+        self._frame = None
         self._tick_coords = []
         self._center = QPoint()
         self._radius = 0
@@ -71,23 +76,59 @@ class ClockRenderer:
             y2 = self._center.y() + self._radius * math.sin(angle - math.pi/2)
             self._tick_coords.append((int(x1), int(y1), int(x2), int(y2)))
         
+        self._need_background_update = True
         self._need_static_update = True
+        self._frame = None
     
     def render_static(self, size, anchor_segments):
         """渲染静态内容到QPixmap缓存"""
         if not self._need_static_update:
             return self._static_pixmap
-            
-        self._static_pixmap = QPixmap(size)
-        self._static_pixmap.fill(Qt.transparent)
+        
+        if self._need_background_update or self._background_pixmap is None or self._background_pixmap.size() != size:
+            self._render_background(size)
+        
+        # 静态层 = 背景层的拷贝 + 已结束的环段
+        self._static_pixmap = self._background_pixmap.copy()
+        
+        painter = QPainter(self._static_pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        
+        # 绘制历史环段
+        self._draw_static_segments(painter, anchor_segments)
+        
+        painter.end()
+        self._need_static_update = False
+        return self._static_pixmap
+    
+    def append_segment(self, segment, index):
+        """
+        把新结束的环段增量绘制到静态层上，无需重绘背景和已有环段
+        
+        静态层尚未生成或已失效（几何变化、日期变化）时什么也不做，等待完整重建。
+        """
+        if self._need_static_update or self._static_pixmap is None or segment is None:
+            return
         
         painter = QPainter(self._static_pixmap)
         painter.setRenderHint(QPainter.Antialiasing)
+        if segment['end'] <= datetime.datetime.now():
+            color = self.event_colors[index % len(self.event_colors)]
+            self._draw_single_segment(painter, segment['start'], segment['end'], color)
+        painter.end()
+    
+    def _render_background(self, size):
+        """渲染背景层：窗口背景、表盘、刻度和按钮，只在几何变化时重绘"""
+        self._background_pixmap = QPixmap(size)
+        self._background_pixmap.fill(Qt.transparent)
+        
+        painter = QPainter(self._background_pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
         
         # 绘制窗口背景
         painter.setBrush(QColor(240, 240, 240, 128))
         painter.setPen(QPen(QColor(200, 200, 200, 128), 1))
-        painter.drawRoundedRect(self._static_pixmap.rect(), 10, 10)
+        painter.drawRoundedRect(self._background_pixmap.rect(), 10, 10)
         
         # 画底色圆
         painter.setBrush(QColor(255, 255, 224))
@@ -102,12 +143,8 @@ class ClockRenderer:
         # 绘制按钮
         self._draw_buttons(painter, size)
         
-        # 绘制历史环段
-        self._draw_static_segments(painter, anchor_segments)
-        
         painter.end()
-        self._need_static_update = False
-        return self._static_pixmap
+        self._need_background_update = False
     
     def _draw_buttons(self, painter, size):
         """绘制右上角按钮"""
@@ -195,58 +232,150 @@ class ClockRenderer:
             start_angle_qt, span_angle_qt
         )
     
-    def draw_dynamic_content(self, painter, anchors, current_segment_index):
+    def draw_dynamic_content(self, painter, anchor_seconds, current_segment_index, now=None):
         """绘制动态内容：当前时间段和时钟指针"""
-        # 绘制当前进行中的时间段
-        if anchors and current_segment_index is not None:
+        if now is None:
             now = datetime.datetime.now()
-            anchor = anchors[current_segment_index]
-            start_time = datetime.datetime.strptime(anchor["time"], "%H:%M:%S").time()
+        
+        # 绘制当前进行中的时间段
+        if anchor_seconds and current_segment_index is not None:
+            start_seconds = anchor_seconds[current_segment_index]
+            now_seconds = now.hour * 3600 + now.minute * 60 + now.second
             
-            if start_time <= now.time():
-                start_dt = datetime.datetime.combine(now.date(), start_time)
+            if start_seconds <= now_seconds:
+                start_dt = datetime.datetime.combine(now.date(), datetime.time()) + datetime.timedelta(seconds=start_seconds)
                 color = self.event_colors[current_segment_index % len(self.event_colors)]
                 self._draw_single_segment(painter, start_dt, now, color)
         
         # 绘制时钟指针
-        now = datetime.datetime.now()
         self._draw_clock_hands(painter, now.hour, now.minute, now.second)
     
+    def advance_frame(self, anchor_seconds, current_segment_index, now=None):
+        """
+        推进到新的一帧，返回与上一帧相比需要重绘的区域
+        
+        返回 None 表示需要整窗重绘（首帧、几何或静态层变化、当前时间段切换）；
+        返回空区域表示画面没有变化。
+        """
+        if now is None:
+            now = datetime.datetime.now()
+        
+        start_seconds = None
+        if anchor_seconds and current_segment_index is not None:
+            start_seconds = anchor_seconds[current_segment_index]
+        
+        frame = {
+            'now': now,
+            'index': current_segment_index,
+            'start_seconds': start_seconds,
+            'hands': self._hand_ends(now.hour, now.minute, now.second),
+            'arc_tip': self._arc_tip(now, start_seconds),
+        }
+        previous = self._frame
+        self._frame = frame
+        
+        if previous is None or self._need_static_update:
+            return None
+        if previous['index'] != frame['index'] or previous['start_seconds'] != frame['start_seconds']:
+            return None
+        
+        region = QRegion()
+        
+        # 指针：旧位置和新位置（只在端点像素变化时）
+        hands_changed = False
+        for name, end in frame['hands'].items():
+            old_end = previous['hands'][name]
+            if old_end != end:
+                width = self._pens[name].width()
+                region = region.united(self._hand_region(old_end, width))
+                region = region.united(self._hand_region(end, width))
+                hands_changed = True
+        if hands_changed:
+            # 中心点
+            region = region.united(QRect(self._center.x() - 7, self._center.y() - 7, 15, 15))
+        
+        # 进行中环段的末端（抗锯齿边缘每秒都可能变化）
+        old_tip = previous['arc_tip']
+        tip = frame['arc_tip']
+        if old_tip is not None or tip is not None:
+            if old_tip is None or tip is None or old_tip[0] != tip[0] or \
+                    abs(old_tip[1].x() - tip[1].x()) + abs(old_tip[1].y() - tip[1].y()) > self._ring_width:
+                # 跨越正午或跳变过大时重绘整个圆环区域
+                outer = self._radius + 2 * self._ring_width + 2
+                region = region.united(QRect(self._center.x() - outer, self._center.y() - outer,
+                                             2 * outer + 1, 2 * outer + 1))
+            else:
+                # 方形线帽会沿切线方向多出半个线宽
+                half = self._ring_width + 3
+                for point in (old_tip[1], tip[1]):
+                    region = region.united(QRect(point.x() - half, point.y() - half, 2 * half + 1, 2 * half + 1))
+        
+        return region
+    
+    def draw_frame(self, painter, anchor_seconds, current_segment_index):
+        """按当前帧的状态绘制动态内容，保证与脏区域计算使用同一时刻"""
+        if self._frame is None:
+            self.advance_frame(anchor_seconds, current_segment_index)
+        frame = self._frame
+        self.draw_dynamic_content(painter, anchor_seconds, frame['index'], frame['now'])
+    
+    def _hand_ends(self, hour, minute, second):
+        """计算三根指针的端点"""
+        return {
+            'hour_hand': self._hand_end(self._center, self._radius*0.6, (hour % 12 + minute/60) * 30),
+            'minute_hand': self._hand_end(self._center, self._radius*0.8, (minute + second/60) * 6),
+            'second_hand': self._hand_end(self._center, self._radius*0.9, second * 6),
+        }
+    
+    def _hand_region(self, end, width):
+        """指针线段（中心到端点）覆盖的区域，包含线宽和抗锯齿余量"""
+        cx, cy = self._center.x(), self._center.y()
+        dx, dy = end.x() - cx, end.y() - cy
+        length = math.hypot(dx, dy) or 1.0
+        ux, uy = dx / length, dy / length
+        margin = width / 2 + 3  # 半线宽 + 方形线帽 + 抗锯齿余量
+        nx, ny = -uy * margin, ux * margin
+        sx, sy = cx - ux * margin, cy - uy * margin
+        ex, ey = end.x() + ux * margin, end.y() + uy * margin
+        return QRegion(QPolygon([
+            QPoint(int(sx + nx), int(sy + ny)), QPoint(int(ex + nx), int(ey + ny)),
+            QPoint(int(ex - nx), int(ey - ny)), QPoint(int(sx - nx), int(sy - ny)),
+        ]))
+    
+    def _arc_tip(self, now, start_seconds):
+        """进行中环段末端所在的 (环, 像素位置)，没有进行中的环段时为 None"""
+        if start_seconds is None:
+            return None
+        now_seconds = now.hour * 3600 + now.minute * 60 + now.second
+        if start_seconds > now_seconds:
+            return None
+        if now_seconds >= 43200:
+            ring_radius = self._radius + self._ring_width + self._ring_width//2
+        else:
+            ring_radius = self._radius + self._ring_width//2
+        angle = (now_seconds % 43200) / 43200 * 360
+        return (ring_radius, self._hand_end(self._center, ring_radius, angle))
+    
     def _draw_clock_hands(self, painter, hour, minute, second):
         """绘制时钟指针"""
-        # 时针
-        painter.save()
-        painter.setPen(self._pens['hour_hand'])
-        angle = (hour % 12 + minute/60) * 30
-        self._draw_hand(painter, self._center, self._radius*0.6, angle)
-        painter.restore()
-        
-        # 分针
-        painter.save()
-        painter.setPen(self._pens['minute_hand'])
-        angle = (minute + second/60) * 6
-        self._draw_hand(painter, self._center, self._radius*0.8, angle)
-        painter.restore()
-        
-        # 秒针
-        painter.save()
-        painter.setPen(self._pens['second_hand'])
-        angle = second * 6
-        self._draw_hand(painter, self._center, self._radius*0.9, angle)
-        painter.restore()
+        ends = self._hand_ends(hour, minute, second)
+        for name in ('hour_hand', 'minute_hand', 'second_hand'):
+            painter.save()
+            painter.setPen(self._pens[name])
+            painter.drawLine(self._center, ends[name])
+            painter.restore()
         
         # 绘制中心点
         painter.setBrush(QColor(0,0,0))
         painter.setPen(Qt.NoPen)
         painter.drawEllipse(self._center, 3, 3)
     
-    def _draw_hand(self, painter, center, length, angle):
-        """绘制指针"""
+    def _hand_end(self, center, length, angle):
+        """计算指针端点"""
         rad = math.radians(90 - angle)
         end_x = center.x() + length * math.cos(rad)
         end_y = center.y() - length * math.sin(rad)
-        end = QPoint(int(end_x), int(end_y))
-        painter.drawLine(center, end)
+        return QPoint(int(end_x), int(end_y))
     
     def get_ring_bounds(self):
         """获取圆环边界信息，用于交互检测"""
@@ -5,6 +5,7 @@ import sys
 
 from clock_renderer import ClockRenderer
 from clock_controller import ClockController
+from widget_diagnostics import WidgetDiagnostics
 
 class ClockWindow(QWidget):
     def __init__(self):
@@ -24,10 +25,18 @@ class ClockWindow(QWidget):
         # 初始化UI
         self.init_ui()
         
-        # 指针定时重绘
+        # 指针定时重绘（只重绘与上一帧相比变化的区域）
         self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update)
+        self.timer.timeout.connect(self.on_tick)
         self.timer.start(1000)
+        
+        # 退出前合并事件日志
+        QApplication.instance().aboutToQuit.connect(self.controller.flush_journal)
+        
+        # 诊断模式（设置环境变量 TIMETABLE_DIAGNOSTICS 时启用）
+        self.diagnostics = WidgetDiagnostics.from_env()
+        if self.diagnostics is not None:
+            self.diagnostics.install(self)
     
     def init_ui(self):
         """初始化用户界面"""
@@ -46,6 +55,7 @@ class ClockWindow(QWidget):
         
         # 计算几何并渲染静态内容
         self.renderer.compute_geometry(self.width(), self.height(), self.input.height())
+        self.controller.update_hit_geometry()
         self.renderer.render_static(self.size(), self.controller.get_anchor_segments())
     
     def move_to_bottom_right(self):
@@ -59,6 +69,7 @@ class ClockWindow(QWidget):
         """窗口大小改变事件"""
         super().resizeEvent(event)
         self.renderer.compute_geometry(self.width(), self.height(), self.input.height())
+        self.controller.update_hit_geometry()
         self.renderer.render_static(self.size(), self.controller.get_anchor_segments())
     
     def paintEvent(self, event):
@@ -72,15 +83,24 @@ class ClockWindow(QWidget):
             if static_pixmap:
                 painter.drawPixmap(0, 0, static_pixmap)
             
-            # 绘制动态内容
+            # 绘制动态内容（与脏区域计算使用同一帧状态）
             current_segment_index = self.controller.get_current_segment_index()
-            self.renderer.draw_dynamic_content(painter, self.controller.get_anchors(), current_segment_index)
+            self.renderer.draw_frame(painter, self.controller.get_anchor_seconds(), current_segment_index)
             
         except Exception as e:
             print(f"Error in paintEvent: {e}")
             import traceback
             traceback.print_exc()
     
+    def on_tick(self):
+        """定时器：推进一帧并只重绘脏区域"""
+        region = self.renderer.advance_frame(self.controller.get_anchor_seconds(),
+                                             self.controller.get_current_segment_index())
+        if region is None:
+            self.update()
+        elif not region.isEmpty():
+            self.update(region)
+    
     def mousePressEvent(self, event):
         """鼠标按下事件"""
         result = self.controller.handle_mouse_press(event)
@@ -115,7 +135,12 @@ class ClockWindow(QWidget):
             event_name = self.input.text()
             if self.controller.add_event(event_name):
                 self.input.clear()
-                self.renderer.invalidate_cache()
+                # 只把新结束的环段绘制到静态层上
+                segments = self.controller.get_anchor_segments()
+                if segments:
+                    self.renderer.append_segment(segments[-1], len(segments) - 1)
+                self.renderer.advance_frame(self.controller.get_anchor_seconds(),
+                                            self.controller.get_current_segment_index())
                 self.update()
         except Exception as e:
             print(f"Error in on_enter: {e}")
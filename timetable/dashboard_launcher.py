@@ -0,0 +1,137 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import webbrowser
+
+from background_writer import BackgroundWriter
+
+
+class DashboardLauncher:
+    """
+    可视化应用启动器 - 在后台线程中完成探测、启动和等待就绪，不阻塞 GUI 线程
+
+    已有实例在运行时直接打开浏览器；否则启动 run_app.py，轮询 /healthz 直到就绪后再打开浏览器。
+    重复点击时只会有一次启动在进行。
+    """
+
+    def __init__(self, host='127.0.0.1', port=8050, startup_timeout=30.0, poll_interval=0.2):
+        """
+        初始化启动器
+
+        Args:
+            host: 可视化应用监听的地址
+            port: 可视化应用监听的端口
+            startup_timeout: 等待应用就绪的最长时间（秒）
+            poll_interval: 就绪探测的间隔（秒）
+        """
+        self.host = host
+        self.port = port
+        self.startup_timeout = startup_timeout
+        self.poll_interval = poll_interval
+        self.url = f"http://{host}:{port}"
+
+        self.process = None
+        self._lock = threading.Lock()
+        self._worker = None
+        self._notifier = None
+
+    def is_ready(self, timeout=0.3):
+        """通过 /healthz 探测应用是否已在运行"""
+        try:
+            with urllib.request.urlopen(f"{self.url}/healthz", timeout=timeout) as response:
+                return response.status == 200
+        except (urllib.error.URLError, OSError, ValueError):
+            return False
+
+    def notify(self, date, timeout=0.3):
+        """
+        通知正在运行的可视化应用某一天的数据有变化，应用未运行时什么也不做
+
+        Args:
+            date: 日期字符串，格式为 'YYYY-MM-DD'
+            timeout: 请求超时（秒）
+        """
+        body = json.dumps({'date': date}).encode('utf-8')
+        req = urllib.request.Request(f"{self.url}/notify", data=body, method='POST',
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(req, timeout=timeout):
+                pass
+        except (urllib.error.URLError, OSError, ValueError):
+            pass
+
+    def notify_async(self, date):
+        """
+        在专用的通知线程上发送 notify，立即返回
+
+        网络请求不占用存储写线程：可视化应用未运行或响应慢时，日志写入和压缩不受影响。
+        同一天尚未发送的通知合并为一次。
+
+        Args:
+            date: 日期字符串，格式为 'YYYY-MM-DD'
+        """
+        with self._lock:
+            if self._notifier is None:
+                self._notifier = BackgroundWriter()
+            notifier = self._notifier
+        notifier.submit(('notify', date), lambda: self.notify(date))
+
+    def open(self):
+        """打开可视化应用（立即返回，实际工作在后台线程中进行）"""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._launch_and_open, daemon=True)
+            self._worker.start()
+
+    def _launch_and_open(self):
+        """后台线程：必要时启动应用，等待就绪后打开浏览器"""
+        try:
+            if not self.is_ready():
+                if not self._start_server():
+                    return
+                if not self._wait_until_ready():
+                    print(f"可视化应用在 {self.startup_timeout} 秒内未就绪")
+                    return
+            webbrowser.open(self.url, new=0, autoraise=True)
+        except Exception as e:
+            print(f"打开可视化应用时出错: {e}")
+
+    def _start_server(self):
+        """启动 run_app.py 子进程，已由本启动器启动且仍在运行时不重复启动"""
+        if self.process is not None and self.process.poll() is None:
+            return True
+
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        run_app_path = os.path.join(current_dir, "run_app.py")
+        if not os.path.exists(run_app_path):
+            print(f"未找到启动脚本: {run_app_path}")
+            return False
+
+        if os.name == 'nt':
+            self.process = subprocess.Popen([sys.executable, run_app_path],
+                                            cwd=current_dir,
+                                            creationflags=subprocess.CREATE_NO_WINDOW)
+        else:
+            self.process = subprocess.Popen([sys.executable, run_app_path],
+                                            cwd=current_dir,
+                                            stdout=subprocess.DEVNULL,
+                                            stderr=subprocess.DEVNULL)
+        return True
+
+    def _wait_until_ready(self):
+        """轮询健康检查，子进程提前退出或超时返回 False"""
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.is_ready():
+                return True
+            if self.process is not None and self.process.poll() is not None:
+                print(f"可视化应用启动失败，退出码: {self.process.returncode}")
+                return False
+            time.sleep(self.poll_interval)
+        return False
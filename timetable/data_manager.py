@@ -1,27 +1,43 @@
 import json
 import os
+import sqlite3
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-import glob
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from day_columns import DayColumns, EventTable, TimeIndex, aggregate_durations, format_seconds
+from metrics import timed
+from rollup_index import RollupIndex
+from storage import StorageEngine, get_engine
+from storage_backends import StorageBackend
 
 class DataManager:
     """数据管理类，负责读取、解析和保存时间数据"""
     
-    def __init__(self, data_dir: str = "../time_data"):
+    def __init__(self, data_dir: Optional[str] = None, backend: Optional[StorageBackend] = None,
+                 cache_max_bytes: int = 64 * 1024 * 1024, storage: Optional[StorageEngine] = None):
         """
         初始化数据管理器
         
         Args:
-            data_dir: 数据文件目录路径
+            data_dir: 数据文件目录路径，默认为统一的数据根目录（见 storage.get_data_dir）
+            backend: 存储后端，默认为 data_dir 下的 JSON 文件后端
+            cache_max_bytes: 数据缓存的内存预算（字节），使用共享存储引擎时不生效
+            storage: 存储引擎；三个参数都未指定时使用本进程共享的默认引擎
         """
-        self.data_dir = data_dir
-        self._data_cache = {}  # 缓存已读取的数据
-        self._ensure_data_dir()
-    
-    def _ensure_data_dir(self):
-        """确保数据目录存在"""
-        if not os.path.exists(self.data_dir):
-            os.makedirs(self.data_dir)
+        if storage is None:
+            if data_dir is None and backend is None:
+                storage = get_engine()
+            else:
+                storage = StorageEngine(data_dir, backend, cache_max_bytes)
+        self.storage = storage
+        self.data_dir = storage.data_dir
+        self.backend = storage.backend
+        # 数据缓存由存储引擎持有，与时钟窗口共用同一条读取路径
+        self._data_cache = storage.cache
+        self.event_table = EventTable()  # 所有日期共享的事件名字符串表
+        self._rollups = None  # 每日汇总索引，首次查询时加载
     
     def get_all_dates(self) -> List[str]:
         """
@@ -30,23 +46,7 @@ class DataManager:
         Returns:
             日期列表，格式为 'YYYY-MM-DD'
         """
-        pattern = os.path.join(self.data_dir, "timedata_*.json")
-        files = glob.glob(pattern)
-        dates = []
-        
-        for file_path in files:
-            filename = os.path.basename(file_path)
-            # 从文件名提取日期
-            if filename.startswith("timedata_") and filename.endswith(".json"):
-                date_str = filename[9:-5]  # 去掉 "timedata_" 和 ".json"
-                try:
-                    # 验证日期格式
-                    datetime.strptime(date_str, "%Y-%m-%d")
-                    dates.append(date_str)
-                except ValueError:
-                    continue
-        
-        return sorted(dates)
+        return self.backend.list_dates()
     
     def load_day_data(self, date: str) -> List[Dict]:
         """
@@ -58,37 +58,109 @@ class DataManager:
         Returns:
             该日期的数据列表，每个元素包含 time 和 event
         """
-        if date in self._data_cache:
-            return self._data_cache[date]
+        return self.storage.load_day(date)
+    
+    def get_day_version(self, date: str):
+        """
+        获取指定日期数据的版本标识
         
-        file_path = os.path.join(self.data_dir, f"timedata_{date}.json")
+        Args:
+            date: 日期字符串，格式为 'YYYY-MM-DD'
+            
+        Returns:
+            版本标识，数据变化时随之变化；没有数据时为 None
+        """
+        return self.backend.day_version(date)
+    
+    def get_day_counter(self, date: str) -> int:
+        """
+        获取指定日期单调递增的版本号
         
-        if not os.path.exists(file_path):
-            return []
+        Args:
+            date: 日期字符串，格式为 'YYYY-MM-DD'
+            
+        Returns:
+            版本号，每次写入（包括时钟窗口追加事件）都会增加；从未写入过时为 0
+        """
+        return self.storage.day_counter(date)
+    
+    def changed_since(self, date: str, counter: int) -> bool:
+        """
+        检查指定日期在版本号 counter 之后是否有新的写入，不重新读取文件
         
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self._data_cache[date] = data
-                return data
-        except (json.JSONDecodeError, FileNotFoundError) as e:
-            print(f"加载数据文件 {file_path} 时出错: {e}")
-            return []
+        Args:
+            date: 日期字符串，格式为 'YYYY-MM-DD'
+            counter: 之前通过 get_day_counter 得到的版本号
+            
+        Returns:
+            有新的写入时返回 True
+        """
+        return self.storage.changed_since(date, counter)
     
-    def load_all_data(self) -> Dict[str, List[Dict]]:
+    def get_data_summary(self) -> Dict:
         """
-        加载所有日期的数据
+        获取数据摘要：轻量的版本号与日期范围
+        
+        版本号由日期数量、首末日期和最后一天（通常是今天）的数据版本组成，
+        新增日期或最后一天追加事件时都会变化。
         
         Returns:
-            字典，键为日期，值为该日期的数据列表
+            字典，包含 version、first_date、last_date 和 count
         """
-        all_data = {}
         dates = self.get_all_dates()
+        if not dates:
+            return {'version': '', 'first_date': None, 'last_date': None, 'count': 0}
         
-        for date in dates:
-            all_data[date] = self.load_day_data(date)
+        last_version = self.get_day_version(dates[-1])
+        version = f"{len(dates)}:{dates[0]}:{dates[-1]}:{hash(last_version) & 0xffffffff:08x}"
+        return {
+            'version': version,
+            'first_date': dates[0],
+            'last_date': dates[-1],
+            'count': len(dates)
+        }
+    
+    @timed('data_manager.load_all_data')
+    def load_all_data(self, max_workers: Optional[int] = None, use_processes: bool = False) -> Dict[str, List[Dict]]:
+        """
+        加载所有日期的数据（并行读取，结果按日期排序）
+        
+        Args:
+            max_workers: 并发数，默认为执行器的默认值
+            use_processes: 使用进程池在子进程中解析
+            
+        Returns:
+            字典，键为日期，值为该日期的数据列表
+        """
+        return dict(self.iter_all_data(max_workers, use_processes))
+    
+    def iter_all_data(self, max_workers: Optional[int] = None, use_processes: bool = False,
+                      ordered: bool = True) -> Iterator[Tuple[str, List[Dict]]]:
+        """
+        并行加载所有日期的数据，每读完一天就产出一天，首个图表无需等待全部历史加载完
         
-        return all_data
+        Args:
+            max_workers: 并发数，默认为执行器的默认值
+            use_processes: 使用进程池在子进程中解析
+            ordered: True 时按日期顺序产出，False 时按完成顺序产出
+            
+        Yields:
+            (日期, 该日期的数据列表)
+        """
+        yield from self.storage.iter_days(self.get_all_dates(), max_workers, use_processes, ordered)
+    
+    def load_date_range(self, start_date: str, end_date: str) -> Dict[str, List[Dict]]:
+        """
+        加载闭区间 [start_date, end_date] 内所有日期的数据
+        
+        Args:
+            start_date: 开始日期，格式为 'YYYY-MM-DD'
+            end_date: 结束日期，格式为 'YYYY-MM-DD'
+            
+        Returns:
+            字典，键为日期，值为该日期的数据列表
+        """
+        return self.storage.load_range(start_date, end_date)
     
     def save_day_data(self, date: str, data: List[Dict]) -> bool:
         """
@@ -102,22 +174,17 @@ class DataManager:
             保存是否成功
         """
         try:
-            file_path = os.path.join(self.data_dir, f"timedata_{date}.json")
-            
             # 确保数据按时间排序
             sorted_data = sorted(data, key=lambda x: x.get('time', '00:00:00'))
             
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(sorted_data, f, ensure_ascii=False, indent=2)
-            
-            # 更新缓存
-            self._data_cache[date] = sorted_data
+            self.storage.save_day(date, sorted_data)
             return True
             
         except Exception as e:
             print(f"保存数据文件时出错: {e}")
             return False
     
+    @timed('data_manager.parse_time_events')
     def parse_time_events(self, date: str) -> List[Dict]:
         """
         解析指定日期的时间事件，计算每个事件的持续时间
@@ -132,6 +199,11 @@ class DataManager:
         if not raw_data:
             return []
         
+        columns = self.get_day_columns(date)
+        durations = columns.durations_hours()
+        # 如果是今天，最后一个事件的结束时间为当前时间，否则为23:59:59
+        last_end_time = format_seconds(columns.day_end)
+        
         events = []
         
         for i in range(len(raw_data)):
@@ -142,41 +214,217 @@ class DataManager:
             if i + 1 < len(raw_data):
                 end_time = raw_data[i + 1]['time']
             else:
-                # 如果是今天，结束时间为当前时间，否则为23:59:59
-                if date == datetime.now().strftime("%Y-%m-%d"):
-                    end_time = datetime.now().strftime("%H:%M:%S")
-                else:
-                    end_time = "23:59:59"
+                end_time = last_end_time
             
             events.append({
                 'start_time': start_time,
                 'end_time': end_time,
                 'event': current_event['event'],
-                'duration': self._calculate_duration(start_time, end_time)
+                'duration': float(durations[i])
             })
         
         return events
     
-    def _calculate_duration(self, start_time: str, end_time: str) -> float:
+    def iter_intervals(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Iterator[Dict]:
         """
-        计算两个时间点之间的持续时间（小时）
+        逐个产出闭区间内每个事件的时间段，一次只读取一天，不经过缓存，内存占用与历史长度无关
         
         Args:
-            start_time: 开始时间，格式为 'HH:MM:SS'
-            end_time: 结束时间，格式为 'HH:MM:SS'
+            start_date: 开始日期，格式为 'YYYY-MM-DD'，默认为最早的日期
+            end_date: 结束日期，格式为 'YYYY-MM-DD'，默认为最晚的日期
+            
+        Yields:
+            字典，包含 date、start_time、end_time、event 和 duration（小时）；
+            今天最后一个事件的结束时间为当前时间，其余日期为23:59:59
+        """
+        if start_date is None and end_date is None:
+            dates = self.get_all_dates()
+        else:
+            dates = self.backend.dates_between(start_date or '0000-00-00', end_date or '9999-99-99')
+        
+        now = datetime.now()
+        today = now.strftime("%Y-%m-%d")
+        for date in dates:
+            try:
+                records = self.backend.load_day(date)
+            except (json.JSONDecodeError, OSError, sqlite3.Error) as e:
+                print(f"加载 {date} 的数据时出错: {e}")
+                continue
+            if not records:
+                continue
+            
+            day_end = now.hour * 3600 + now.minute * 60 + now.second if date == today else 86399
+            columns = DayColumns.from_records(date, records, self.event_table, day_end)
+            durations = columns.durations_hours().tolist()
+            last_end_time = format_seconds(day_end)
+            for i, record in enumerate(records):
+                yield {
+                    'date': date,
+                    'start_time': record['time'],
+                    'end_time': records[i + 1]['time'] if i + 1 < len(records) else last_end_time,
+                    'event': record['event'],
+                    'duration': durations[i]
+                }
+    
+    @timed('data_manager.get_day_columns')
+    def get_day_columns(self, date: str) -> DayColumns:
+        """
+        获取指定日期事件的列式表示（起始秒数、事件 id、共享字符串表）
+        
+        Args:
+            date: 日期字符串
             
         Returns:
-            持续时间（小时）
+            DayColumns 实例；今天的最后结束时间为当前时间，其余日期为23:59:59
         """
-        try:
-            start = datetime.strptime(start_time, "%H:%M:%S")
-            end = datetime.strptime(end_time, "%H:%M:%S")
+        now = datetime.now()
+        if date == now.strftime("%Y-%m-%d"):
+            day_end = now.hour * 3600 + now.minute * 60 + now.second
+        else:
+            day_end = 86399
+        
+        data = self.load_day_data(date)
+        entry = self._data_cache.peek(date)
+        if entry is not None and entry.columns is not None and entry.data is data:
+            columns = entry.columns
+        else:
+            columns = DayColumns.from_records(date, data, self.event_table, day_end)
+            if entry is not None and entry.data is data:
+                self._data_cache.attach_columns(date, columns)
+        return columns.with_day_end(day_end)
+    
+    def build_time_index(self, dates: List[str]) -> TimeIndex:
+        """
+        构建多天事件的时间索引，供批量查找重复使用
+        
+        Args:
+            dates: 日期列表（升序）
+            
+        Returns:
+            TimeIndex 实例；过去日期的最后一个事件持续到当天结束，今天的持续到当前时间
+        """
+        today = datetime.now().strftime("%Y-%m-%d")
+        columns_list = []
+        for date in dates:
+            columns = self.get_day_columns(date)
+            columns_list.append(columns if date == today else columns.with_day_end(86400))
+        return TimeIndex(columns_list)
+    
+    def lookup_events(self, timestamps: Iterable) -> Dict[str, np.ndarray]:
+        """
+        批量查询每个时刻正在进行的事件（"那时我在做什么"）
+        
+        只读取时刻实际落在的那些天，整批时刻在合并后的时间索引上一次完成查找，
+        百万级的时刻也无需逐个遍历。
+        
+        Args:
+            timestamps: 本地时间的 datetime 序列或 numpy datetime64 数组
+            
+        Returns:
+            字典，各数组与输入等长：
+            - found: 是否落在某个事件内（bool）
+            - event: 事件名，未找到时为 None（object）
+            - start / end: 该事件的起止时间，未找到时为 NaT（datetime64[s]）
+        """
+        times = np.asarray(timestamps, dtype='datetime64[s]').ravel()
+        
+        dates = []
+        known = times[~np.isnat(times)]
+        if len(known):
+            days = np.unique(known.astype('datetime64[D]'))
+            wanted = set(np.datetime_as_string(days))
+            dates = [date for date in self.backend.dates_between(str(days[0]), str(days[-1])) if date in wanted]
+        index = self.build_time_index(dates)
+        
+        seconds = times.astype(np.int64)
+        positions = index.lookup(seconds)
+        found = (positions >= 0) & ~np.isnat(times)
+        hit = positions[found]
+        
+        names = np.array(self.event_table.names + [None], dtype=object)
+        event_ids = np.full(len(times), len(names) - 1, dtype=np.int64)
+        event_ids[found] = index.event_ids[hit]
+        start = np.full(len(times), np.datetime64('NaT'), dtype='datetime64[s]')
+        end = start.copy()
+        start[found] = index.starts[hit].astype('datetime64[s]')
+        end[found] = index.ends[hit].astype('datetime64[s]')
+        return {
+            'found': found,
+            'event': names[event_ids],
+            'start': start,
+            'end': end
+        }
+    
+    @property
+    def rollups(self) -> RollupIndex:
+        """每日汇总索引（每天每个事件的时长与按小时分布），保存在数据目录下的 rollups.json"""
+        if self._rollups is None:
+            self._rollups = RollupIndex(self.backend, os.path.join(self.data_dir, "rollups.json"))
+        return self._rollups
+    
+    def query_event_totals(self, start_date: str, end_date: str) -> Dict[str, float]:
+        """
+        基于汇总索引，统计闭区间内每个事件的总时长
+        
+        Args:
+            start_date: 开始日期，格式为 'YYYY-MM-DD'
+            end_date: 结束日期，格式为 'YYYY-MM-DD'
             
-            duration = end - start
-            return duration.total_seconds() / 3600  # 转换为小时
+        Returns:
+            字典，键为事件名，值为总时长（小时）
+        """
+        return self.rollups.event_totals(start_date, end_date)
+    
+    def query_hour_histogram(self, start_date: str, end_date: str, event: Optional[str] = None) -> List[float]:
+        """
+        基于汇总索引，统计闭区间内 24 个整点区间的时长分布
+        
+        Args:
+            start_date: 开始日期
+            end_date: 结束日期
+            event: 只统计该事件，默认为全部事件
             
-        except ValueError:
-            return 0.0
+        Returns:
+            长度为 24 的列表，每个元素为该整点区间内的总时长（小时）
+        """
+        return self.rollups.hour_histogram(start_date, end_date, event)
+    
+    def query_period_totals(self, start_date: str, end_date: str, period: str = 'week',
+                            event: Optional[str] = None) -> Dict[str, float]:
+        """
+        基于汇总索引，按周或按月统计时长
+        
+        Args:
+            start_date: 开始日期
+            end_date: 结束日期
+            period: 'week' 或 'month'
+            event: 只统计该事件，默认为全部事件
+            
+        Returns:
+            字典，键为周期（'YYYY-Www' 或 'YYYY-MM'），值为总时长（小时）
+        """
+        return self.rollups.period_totals(start_date, end_date, period, event)
+    
+    def get_cache_stats(self) -> Dict[str, int]:
+        """
+        获取数据缓存的统计信息
+        
+        Returns:
+            包含命中、未命中、淘汰次数以及条目数和占用字节数的字典
+        """
+        return self._data_cache.stats()
+    
+    def get_event_totals(self, dates: List[str]) -> Dict[str, float]:
+        """
+        汇总多天中每个事件的总时长
+        
+        Args:
+            dates: 日期列表
+            
+        Returns:
+            字典，键为事件名，值为总时长（小时）
+        """
+        return aggregate_durations([self.get_day_columns(date) for date in dates], self.event_table)
     
     def get_today_data(self) -> List[Dict]:
         """
@@ -198,13 +446,7 @@ class DataManager:
         Returns:
             日期列表
         """
-        all_dates = self.get_all_dates()
-        if not all_dates:
-            return []
-        
-        # 获取最近的日期
-        recent_dates = all_dates[-days:] if len(all_dates) >= days else all_dates
-        return recent_dates
+        return self.backend.recent_dates(days)
 
 # 测试代码
 if __name__ == "__main__":
@@ -0,0 +1,169 @@
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+DATA_FILE_PATTERN = re.compile(r"^timedata_(\d{4}-\d{2}-\d{2})\.json$")
+
+
+class DateManifest:
+    """
+    数据目录清单：记录所有有数据的日期及其文件大小和修改时间
+
+    清单保存在数据目录下的 manifest.json。每次访问只 os.stat 一次目录，
+    目录修改时间不变时直接使用清单；变化时用 os.scandir 重新扫描，
+    清单损坏或缺失时同样重新扫描（自愈）。
+    """
+
+    FILENAME = "manifest.json"
+    FORMAT = 1
+
+    def __init__(self, data_dir: str):
+        """
+        初始化目录清单
+
+        Args:
+            data_dir: 数据文件目录路径
+        """
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, self.FILENAME)
+
+        self._lock = threading.Lock()
+        self._dir_mtime_ns: Optional[int] = None
+        self._dates: List[str] = []
+        self._entries: Dict[str, Tuple[int, int]] = {}
+        self._load()
+
+    def _load(self):
+        """读取持久化的清单，格式不对时忽略"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('format') != self.FORMAT:
+                return
+            self._entries = {date: (size, mtime_ns) for date, size, mtime_ns in manifest['entries']}
+            self._dates = sorted(self._entries)
+            self._dir_mtime_ns = manifest['dir_mtime_ns']
+        except (OSError, ValueError, KeyError, TypeError):
+            self._entries = {}
+            self._dates = []
+            self._dir_mtime_ns = None
+
+    def _save(self):
+        """通过临时文件 + os.replace 原子地写回清单"""
+        tmp_path = self.path + ".tmp"
+        manifest = {
+            'format': self.FORMAT,
+            'dir_mtime_ns': self._dir_mtime_ns,
+            'entries': [[date, *self._entries[date]] for date in self._dates],
+        }
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"保存目录清单 {self.path} 时出错: {e}")
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        """用 os.scandir 扫描数据目录"""
+        entries = {}
+        with os.scandir(self.data_dir) as it:
+            for entry in it:
+                match = DATA_FILE_PATTERN.match(entry.name)
+                if not match:
+                    continue
+                date = match.group(1)
+                if date not in self._entries:
+                    # 只有新出现的文件名才需要完整校验日期
+                    try:
+                        datetime.strptime(date, "%Y-%m-%d")
+                    except ValueError:
+                        continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries[date] = (st.st_size, st.st_mtime_ns)
+        return entries
+
+    def refresh(self):
+        """目录修改时间变化时重新扫描"""
+        with self._lock:
+            try:
+                dir_mtime_ns = os.stat(self.data_dir).st_mtime_ns
+            except FileNotFoundError:
+                self._entries = {}
+                self._dates = []
+                self._dir_mtime_ns = None
+                return
+
+            if dir_mtime_ns == self._dir_mtime_ns:
+                return
+
+            entries = self._scan()
+            changed = entries != self._entries
+            self._entries = entries
+            self._dates = sorted(entries)
+
+            # 目录刚被修改时（同一时间粒度内可能还有写入）不信任该修改时间，下次访问再扫描
+            if time.time_ns() - dir_mtime_ns < 2_000_000_000:
+                self._dir_mtime_ns = None
+            else:
+                self._dir_mtime_ns = dir_mtime_ns
+
+            if changed:
+                self._save()
+                if self._dir_mtime_ns is not None:
+                    # 写清单本身也会改变目录修改时间
+                    self._dir_mtime_ns = os.stat(self.data_dir).st_mtime_ns
+
+    @property
+    def dates(self) -> List[str]:
+        """所有有数据的日期（升序）"""
+        self.refresh()
+        return list(self._dates)
+
+    def dates_between(self, start_date: str, end_date: str) -> List[str]:
+        """
+        获取闭区间 [start_date, end_date] 内有数据的日期
+
+        Args:
+            start_date: 开始日期，格式为 'YYYY-MM-DD'
+            end_date: 结束日期，格式为 'YYYY-MM-DD'
+
+        Returns:
+            日期列表（升序）
+        """
+        self.refresh()
+        dates = self._dates
+        return dates[bisect_left(dates, start_date):bisect_right(dates, end_date)]
+
+    def recent(self, days: int) -> List[str]:
+        """获取最近 days 个有数据的日期（升序）"""
+        self.refresh()
+        return self._dates[-days:] if days > 0 else []
+
+    def get_entry(self, date: str) -> Optional[Tuple[int, int]]:
+        """
+        获取某一天数据文件在扫描时的 (大小, 修改时间纳秒)
+
+        Args:
+            date: 日期字符串
+
+        Returns:
+            (size, mtime_ns)，不存在时返回 None
+        """
+        self.refresh()
+        return self._entries.get(date)
+
+    def __contains__(self, date: str) -> bool:
+        self.refresh()
+        return date in self._entries
+
+    def __len__(self):
+        self.refresh()
+        return len(self._dates)
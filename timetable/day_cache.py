@@ -0,0 +1,183 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Hashable, List, Optional
+
+
+def estimate_records_size(records: List[Dict]) -> int:
+    """
+    估算一天原始数据占用的内存字节数
+
+    Args:
+        records: 原始数据列表
+
+    Returns:
+        估算的字节数
+    """
+    size = sys.getsizeof(records)
+    for record in records:
+        size += sys.getsizeof(record)
+        for value in record.values():
+            size += sys.getsizeof(value)
+    return size
+
+
+class CacheEntry:
+    """缓存条目：某一天的数据及其文件版本"""
+
+    __slots__ = ('version', 'data', 'columns', 'nbytes', 'checked_at')
+
+    def __init__(self, version: Hashable, data: List[Dict], nbytes: int, checked_at: float):
+        self.version = version
+        self.data = data
+        self.columns = None  # 由 DataManager 按需附加的列式数据
+        self.nbytes = nbytes
+        self.checked_at = checked_at
+
+
+class DayCache:
+    """按 (date, 文件版本) 校验的 LRU 缓存，总内存不超过设定预算"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, past_day_ttl: float = 60.0):
+        """
+        初始化缓存
+
+        Args:
+            max_bytes: 内存预算（字节），超出后按最近最少使用淘汰
+            past_day_ttl: 过去日期的条目在多少秒内免校验；今天的条目每次访问都校验
+        """
+        self.max_bytes = max_bytes
+        self.past_day_ttl = past_day_ttl
+
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, date: str, version_fn: Callable[[], Optional[Hashable]]) -> Optional[CacheEntry]:
+        """
+        查找缓存条目，必要时用 version_fn 校验文件版本
+
+        Args:
+            date: 日期字符串
+            version_fn: 返回该日期当前文件版本的函数（通常是一次 os.stat）
+
+        Returns:
+            命中时返回缓存条目，否则返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(date)
+            if entry is None:
+                self.misses += 1
+                return None
+
+        now = time.monotonic()
+        is_today = date == datetime.now().strftime("%Y-%m-%d")
+        if is_today or now - entry.checked_at >= self.past_day_ttl:
+            if version_fn() != entry.version:
+                self.invalidate(date)
+                with self._lock:
+                    self.misses += 1
+                return None
+            entry.checked_at = now
+
+        with self._lock:
+            if date in self._entries:
+                self._entries.move_to_end(date)
+            self.hits += 1
+        return entry
+
+    def peek(self, date: str) -> Optional[CacheEntry]:
+        """获取缓存条目，不校验版本也不计入命中统计"""
+        with self._lock:
+            return self._entries.get(date)
+
+    def put(self, date: str, version: Hashable, data: List[Dict]) -> CacheEntry:
+        """
+        写入缓存条目
+
+        Args:
+            date: 日期字符串
+            version: 数据读取前的文件版本
+            data: 该日期的数据列表
+
+        Returns:
+            新的缓存条目
+        """
+        entry = CacheEntry(version, data, estimate_records_size(data), time.monotonic())
+        with self._lock:
+            old = self._entries.pop(date, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[date] = entry
+            self._bytes += entry.nbytes
+            self._evict()
+        return entry
+
+    def attach_columns(self, date: str, columns):
+        """
+        为缓存条目附加列式数据，并计入内存预算
+
+        Args:
+            date: 日期字符串
+            columns: DayColumns 实例
+        """
+        with self._lock:
+            entry = self._entries.get(date)
+            if entry is None or entry.columns is not None:
+                return
+            entry.columns = columns
+            extra = columns.starts.nbytes + columns.event_ids.nbytes
+            entry.nbytes += extra
+            self._bytes += extra
+            self._evict()
+
+    def invalidate(self, date: str):
+        """使某一天的缓存失效"""
+        with self._lock:
+            entry = self._entries.pop(date, None)
+            if entry is not None:
+                self._bytes -= entry.nbytes
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _evict(self):
+        """淘汰最近最少使用的条目直到满足内存预算（至少保留最新一条）"""
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.nbytes
+            self.evictions += 1
+
+    def __contains__(self, date: str) -> bool:
+        with self._lock:
+            return date in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            包含命中、未命中、淘汰次数以及条目数和占用字节数的字典
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
@@ -0,0 +1,248 @@
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def parse_time_array(times: List[str]) -> np.ndarray:
+    """
+    把一组 'HH:MM:SS' 字符串批量转换为秒数
+
+    格式正确时直接在字节数组上做向量化计算；格式不正确的元素记为 -1。
+
+    Args:
+        times: 时间字符串列表
+
+    Returns:
+        int32 秒数数组
+    """
+    if not times:
+        return np.empty(0, dtype=np.int32)
+
+    joined = ''.join(times)
+    if len(joined) == 8 * len(times) and joined.isascii():
+        digits = np.frombuffer(joined.encode('ascii'), dtype=np.uint8).reshape(-1, 8).astype(np.int32) - 48
+        colons_ok = (digits[:, 2] == 10) & (digits[:, 5] == 10)  # ':' - '0' == 10
+        digits_ok = ((digits[:, [0, 1, 3, 4, 6, 7]] >= 0) & (digits[:, [0, 1, 3, 4, 6, 7]] <= 9)).all(axis=1)
+        seconds = ((digits[:, 0] * 10 + digits[:, 1]) * 3600
+                   + (digits[:, 3] * 10 + digits[:, 4]) * 60
+                   + digits[:, 6] * 10 + digits[:, 7])
+        valid = colons_ok & digits_ok & (seconds < 86400)
+        if valid.all():
+            return seconds.astype(np.int32)
+
+    # 存在格式异常的元素，逐个解析
+    seconds = np.empty(len(times), dtype=np.int32)
+    for i, time_str in enumerate(times):
+        try:
+            h, m, s = map(int, time_str.split(':'))
+            seconds[i] = h * 3600 + m * 60 + s if 0 <= h < 24 and 0 <= m < 60 and 0 <= s < 60 else -1
+        except (ValueError, AttributeError):
+            seconds[i] = -1
+    return seconds
+
+
+def format_seconds(seconds: int) -> str:
+    """
+    把秒数格式化为 'HH:MM:SS'
+
+    Args:
+        seconds: 当天的秒数
+
+    Returns:
+        时间字符串
+    """
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class EventTable:
+    """事件名字符串表，把事件名映射为整数 id，供所有日期共享（可被多个回调线程同时使用）"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        self._lock = threading.Lock()
+
+    def intern(self, name: str) -> int:
+        """
+        获取事件名对应的 id，不存在时新建
+
+        Args:
+            name: 事件名
+
+        Returns:
+            事件 id
+        """
+        event_id = self._ids.get(name)
+        if event_id is not None:
+            return event_id
+        with self._lock:
+            event_id = self._ids.get(name)
+            if event_id is None:
+                # 先追加名称再发布 id，其他线程拿到 id 时 names 中一定已有对应的名称
+                event_id = len(self.names)
+                self.names.append(name)
+                self._ids[name] = event_id
+            return event_id
+
+    def lookup(self, name: str) -> Optional[int]:
+        """获取事件名对应的 id，不存在时返回 None"""
+        return self._ids.get(name)
+
+    def __len__(self):
+        return len(self.names)
+
+
+class DayColumns:
+    """某一天事件的列式表示：起始秒数、事件 id 与共享字符串表"""
+
+    def __init__(self, date: str, starts: np.ndarray, event_ids: np.ndarray,
+                 table: EventTable, day_end: int):
+        """
+        Args:
+            date: 日期字符串，格式为 'YYYY-MM-DD'
+            starts: 每个事件的起始秒数（int32，-1 表示时间格式异常）
+            event_ids: 每个事件在字符串表中的 id（int32）
+            table: 共享的事件名字符串表
+            day_end: 最后一个事件的结束秒数
+        """
+        self.date = date
+        self.starts = starts
+        self.event_ids = event_ids
+        self.table = table
+        self.day_end = day_end
+
+    @classmethod
+    def from_records(cls, date: str, records: List[Dict], table: EventTable,
+                     day_end: int) -> "DayColumns":
+        """
+        由原始数据构建列式表示
+
+        Args:
+            date: 日期字符串
+            records: 原始数据列表，每个元素包含 time 和 event
+            table: 共享的事件名字符串表
+            day_end: 最后一个事件的结束秒数
+
+        Returns:
+            DayColumns 实例
+        """
+        starts = parse_time_array([record['time'] for record in records])
+        event_ids = np.fromiter((table.intern(record['event']) for record in records),
+                                dtype=np.int32, count=len(records))
+        return cls(date, starts, event_ids, table, day_end)
+
+    def with_day_end(self, day_end: int) -> "DayColumns":
+        """返回共享同一组数组、但最后结束时间不同的副本"""
+        if day_end == self.day_end:
+            return self
+        return DayColumns(self.date, self.starts, self.event_ids, self.table, day_end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def ends(self) -> np.ndarray:
+        """每个事件的结束秒数，即下一个事件的起始秒数"""
+        ends = np.empty_like(self.starts)
+        ends[:-1] = self.starts[1:]
+        if len(ends):
+            ends[-1] = self.day_end
+        return ends
+
+    @property
+    def durations(self) -> np.ndarray:
+        """每个事件的持续秒数，时间格式异常的事件记为 0"""
+        starts = self.starts
+        ends = self.ends
+        return np.where((starts >= 0) & (ends >= 0), ends - starts, 0).astype(np.int32)
+
+    def durations_hours(self) -> np.ndarray:
+        """每个事件的持续时间（小时）"""
+        return self.durations / 3600.0
+
+    @property
+    def event_names(self) -> List[str]:
+        """每个事件的事件名"""
+        names = self.table.names
+        return [names[event_id] for event_id in self.event_ids]
+
+
+def aggregate_durations(columns_list: List[DayColumns], table: EventTable) -> Dict[str, float]:
+    """
+    汇总多天中每个事件的总时长
+
+    Args:
+        columns_list: 多天的列式数据，需共享同一个字符串表
+        table: 共享的事件名字符串表
+
+    Returns:
+        字典，键为事件名，值为总时长（小时）
+    """
+    columns_list = [columns for columns in columns_list if len(columns)]
+    if not columns_list:
+        return {}
+
+    event_ids = np.concatenate([columns.event_ids for columns in columns_list])
+    durations = np.concatenate([columns.durations for columns in columns_list])
+    totals = np.bincount(event_ids, weights=durations, minlength=len(table)) / 3600.0
+    return {table.names[i]: float(totals[i]) for i in np.flatnonzero(totals)}
+
+
+class TimeIndex:
+    """
+    多天事件的时间索引：所有事件按绝对秒数（自 1970-01-01 起，本地时间）排序的起止数组
+
+    每天的起始秒数加上当天零点的绝对秒数后首尾相接，天与天之间天然有序，
+    因此日期索引和天内查找合并为对整个数组的一次 searchsorted。
+    """
+
+    def __init__(self, columns_list: List[DayColumns]):
+        """
+        Args:
+            columns_list: 多天的列式数据（按日期升序），需共享同一个字符串表；
+                          每天最后一个事件持续到该天的 day_end
+        """
+        starts, ends, event_ids = [], [], []
+        for columns in columns_list:
+            valid = columns.starts >= 0
+            day_starts = columns.starts[valid].astype(np.int64)
+            if not len(day_starts):
+                continue
+            day_ids = columns.event_ids[valid]
+            if np.any(day_starts[1:] < day_starts[:-1]):
+                order = np.argsort(day_starts, kind='stable')
+                day_starts = day_starts[order]
+                day_ids = day_ids[order]
+            day_ends = np.empty_like(day_starts)
+            day_ends[:-1] = day_starts[1:]
+            day_ends[-1] = max(columns.day_end, day_starts[-1])
+
+            base = np.datetime64(columns.date, 's').astype(np.int64)
+            starts.append(day_starts + base)
+            ends.append(day_ends + base)
+            event_ids.append(day_ids)
+
+        self.table = columns_list[0].table if columns_list else None
+        self.starts = np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+        self.ends = np.concatenate(ends) if ends else np.empty(0, dtype=np.int64)
+        self.event_ids = np.concatenate(event_ids) if event_ids else np.empty(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def lookup(self, seconds: np.ndarray) -> np.ndarray:
+        """
+        批量查找每个时刻所在的事件
+
+        Args:
+            seconds: 绝对秒数数组（int64）
+
+        Returns:
+            与 seconds 等长的事件位置数组（int64），不在任何事件的 [开始, 结束) 内时为 -1
+        """
+        positions = np.searchsorted(self.starts, seconds, side='right') - 1
+        found = positions >= 0
+        found[found] = seconds[found] < self.ends[positions[found]]
+        return np.where(found, positions, -1)
@@ -0,0 +1,344 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+from background_writer import write_json_atomic
+from metrics import registry
+
+
+def get_journal_path(snapshot_path: str) -> str:
+    """
+    获取快照文件对应的日志文件路径
+
+    Args:
+        snapshot_path: 快照文件路径，格式为 'timedata_YYYY-MM-DD.json'
+
+    Returns:
+        日志文件路径，格式为 'timedata_YYYY-MM-DD.journal'
+    """
+    base, _ = os.path.splitext(snapshot_path)
+    return base + ".journal"
+
+
+def get_version_path(snapshot_path: str) -> str:
+    """
+    获取快照文件对应的版本文件路径
+
+    Args:
+        snapshot_path: 快照文件路径，格式为 'timedata_YYYY-MM-DD.json'
+
+    Returns:
+        版本文件路径，格式为 'timedata_YYYY-MM-DD.version'
+    """
+    base, _ = os.path.splitext(snapshot_path)
+    return base + ".version"
+
+
+def bump_version(snapshot_path: str, count: int = 2):
+    """
+    递增这一天的版本号
+
+    版本文件每次递增追加 count 个字节，版本号即文件大小：O_APPEND 追加在多个进程之间也不会丢失，
+    读取版本只需一次 os.stat，且版本号单调递增。
+    版本号为奇数表示有写入正在替换文件（类似 seqlock），一次完成的写入递增 2。
+
+    Args:
+        snapshot_path: 快照文件路径
+        count: 递增量
+    """
+    with open(get_version_path(snapshot_path), 'ab') as f:
+        f.write(b'\n' * count)
+
+
+def read_version(snapshot_path: str) -> int:
+    """
+    读取这一天的版本号
+
+    Args:
+        snapshot_path: 快照文件路径
+
+    Returns:
+        版本号，从未写入过时为 0
+    """
+    try:
+        return os.stat(get_version_path(snapshot_path)).st_size
+    except FileNotFoundError:
+        return 0
+
+
+def read_journal_records(journal_path: str) -> List[Dict]:
+    """
+    读取日志文件中的全部记录
+
+    每行一条 JSON 记录；写到一半的末行（进程崩溃或并发读取时）会被跳过。
+
+    Args:
+        journal_path: 日志文件路径
+
+    Returns:
+        记录列表，每个元素包含 time 和 event
+    """
+    records = []
+    try:
+        f = open(journal_path, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        # 不存在，或在检查与打开之间被压缩改名/删除
+        return records
+
+    with f:
+        registry.add('storage.bytes_read', os.fstat(f.fileno()).st_size)
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def get_marker_path(journal_path: str) -> str:
+    """
+    获取压缩标记文件路径
+
+    Args:
+        journal_path: 日志文件路径
+
+    Returns:
+        标记文件路径，格式为 'timedata_YYYY-MM-DD.journal.compacted'
+    """
+    return journal_path + ".compacted"
+
+
+def read_compaction_marker(journal_path: str) -> Optional[Dict]:
+    """
+    读取压缩标记
+
+    压缩在替换快照之前写入标记，记录这次合并了 .compacting 中的多少条记录，以及合并后快照的记录数；
+    删除 .compacting 之后再删除标记。两者之间崩溃时，据此判断快照是否已经包含这些记录。
+
+    Args:
+        journal_path: 日志文件路径
+
+    Returns:
+        包含 lines 和 snapshot_records 的字典，不存在或损坏时返回 None
+    """
+    try:
+        with open(get_marker_path(journal_path), 'r', encoding='utf-8') as f:
+            marker = json.load(f)
+        return {'lines': int(marker['lines']), 'snapshot_records': int(marker['snapshot_records'])}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def unfolded_records(snapshot: List[Dict], records: List[Dict], marker: Optional[Dict]) -> List[Dict]:
+    """
+    去掉 .compacting 中已经合并进快照的记录
+
+    按日志中的位置而不是内容判断：同一秒内重复记录的同名事件都会保留。
+
+    Args:
+        snapshot: 快照数据列表
+        records: .compacting 文件中的记录
+        marker: 压缩标记（见 read_compaction_marker）
+
+    Returns:
+        尚未合并进快照的记录
+    """
+    if marker is not None and records and len(snapshot) == marker['snapshot_records']:
+        # 快照已替换为合并后的版本，标记记录的那些行已在其中
+        return records[marker['lines']:]
+    return records
+
+
+def load_with_journal(snapshot_path: str) -> List[Dict]:
+    """
+    读取快照文件并合并尚未压缩的日志记录
+
+    Args:
+        snapshot_path: 快照文件路径
+
+    Returns:
+        合并后的数据列表
+    """
+    snapshot = []
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, 'r', encoding='utf-8') as f:
+            registry.add('storage.bytes_read', os.fstat(f.fileno()).st_size)
+            snapshot = json.load(f)
+
+    journal_path = get_journal_path(snapshot_path)
+    records = read_journal_records(journal_path + ".compacting")
+    if records:
+        records = unfolded_records(snapshot, records, read_compaction_marker(journal_path))
+    records.extend(read_journal_records(journal_path))
+    return snapshot + records if records else snapshot
+
+
+class EventJournal:
+    """追加写事件日志，每个新锚点追加一行记录，由后台压缩合并回快照文件"""
+
+    def __init__(self, snapshot_path: str, fsync: bool = True,
+                 compact_threshold: int = 50, compact_delay: float = 30.0, writer=None):
+        """
+        初始化事件日志
+
+        Args:
+            snapshot_path: 快照文件路径（timedata_YYYY-MM-DD.json）
+            fsync: 每次追加后是否调用 fsync 落盘
+            compact_threshold: 日志记录数达到该值时立即触发压缩
+            compact_delay: 追加后等待多少秒再进行后台压缩
+            writer: BackgroundWriter，提供时追加和压缩都在写线程上执行，append 只入队
+        """
+        self.snapshot_path = snapshot_path
+        self.journal_path = get_journal_path(snapshot_path)
+        self.fsync = fsync
+        self.compact_threshold = compact_threshold
+        self.compact_delay = compact_delay
+        self.writer = writer
+
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._pending = 0
+
+    def append(self, record: Dict):
+        """
+        追加一条记录
+
+        Args:
+            record: 记录，包含 time 和 event
+        """
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self.writer is None:
+                self._write_lines([line])
+            else:
+                self._buffer.append(line)
+            self._pending += 1
+            pending = self._pending
+
+        if self.writer is not None:
+            # 写线程来不及处理时，连续的追加合并为一次写入和一次 fsync
+            self.writer.submit(('journal_append', self.journal_path), self._flush_buffer)
+
+        if pending >= self.compact_threshold:
+            self.schedule_compaction(0)
+        else:
+            self.schedule_compaction()
+
+    def _write_lines(self, lines: List[str]):
+        """把若干行追加到日志文件（调用方持有 _lock）"""
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(''.join(lines))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        # 追加只会增加完整的行，不需要标记为写入中；写完后递增版本
+        bump_version(self.snapshot_path)
+
+    def _flush_buffer(self):
+        """在写线程上写出缓冲的记录"""
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+            if lines:
+                try:
+                    self._write_lines(lines)
+                except OSError:
+                    # 写入失败时放回缓冲区，下次追加或压缩时重试
+                    self._buffer[:0] = lines
+                    raise
+
+    def schedule_compaction(self, delay: Optional[float] = None):
+        """
+        安排一次后台压缩，重复调用会重新计时
+
+        Args:
+            delay: 延迟秒数，默认为 compact_delay
+        """
+        if delay is None:
+            delay = self.compact_delay
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(delay, self.request_compaction)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def request_compaction(self):
+        """立即请求一次压缩：有写线程时交给写线程，保证与追加按顺序执行"""
+        if self.writer is None:
+            self.compact()
+        else:
+            self.writer.submit(('journal_compact', self.journal_path), self.compact)
+
+    def cancel(self):
+        """取消尚未执行的后台压缩"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def compact(self) -> bool:
+        """
+        把日志合并进快照文件
+
+        先把日志原子地改名为 .compacting，新的追加写入新日志；
+        写入压缩标记后，合并结果通过临时文件 + os.replace 写回快照，最后删除 .compacting 和标记。
+        中途崩溃时，下次压缩或读取根据标记跳过已经合并进快照的记录。
+
+        Returns:
+            压缩是否成功
+        """
+        compacting_path = self.journal_path + ".compacting"
+        marker_path = get_marker_path(self.journal_path)
+        with self._compact_lock:
+            marked = False
+            try:
+                with self._lock:
+                    self._timer = None
+                    if self._buffer:
+                        self._write_lines(self._buffer)
+                        self._buffer = []
+                    self._pending = 0
+                    has_journal = os.path.exists(self.journal_path)
+                    if not has_journal and not os.path.exists(compacting_path):
+                        return True
+
+                    # 改名前把版本号置为奇数：读者在此期间读到的快照和日志可能不一致，需要重读
+                    # （上次压缩中途崩溃留下的奇数版本号先补齐）
+                    bump_version(self.snapshot_path, 2 if read_version(self.snapshot_path) % 2 else 1)
+                    marked = True
+                    if has_journal and not os.path.exists(compacting_path):
+                        # 上次压缩在删除 .compacting 之后崩溃时留下的标记与新的 .compacting 无关
+                        if os.path.exists(marker_path):
+                            os.remove(marker_path)
+                        os.replace(self.journal_path, compacting_path)
+
+                snapshot = []
+                if os.path.exists(self.snapshot_path):
+                    with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                        snapshot = json.load(f)
+                folded = read_journal_records(compacting_path)
+                # 上次压缩在替换快照之后、删除 .compacting 之前崩溃时，其中的记录已在快照中
+                merged = snapshot + unfolded_records(snapshot, folded, read_compaction_marker(self.journal_path))
+
+                write_json_atomic(marker_path, {'lines': len(folded), 'snapshot_records': len(merged)})
+                write_json_atomic(self.snapshot_path, merged)
+                os.remove(compacting_path)
+                os.remove(marker_path)
+                return True
+
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"压缩日志文件 {self.journal_path} 时出错: {e}")
+                return False
+
+            finally:
+                if marked:
+                    # 版本号恢复为偶数，读者可以继续读取
+                    bump_version(self.snapshot_path, 1)
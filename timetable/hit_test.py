@@ -0,0 +1,103 @@
+import math
+from array import array
+
+# 每个环 12 小时，每秒一个角度分箱
+RING_SECONDS = 43200
+
+
+class PolarHitTable:
+    """悬停命中表 - 几何或锚点变化时重建，每次鼠标移动只做常数次整数运算和一次查表"""
+
+    def __init__(self):
+        # 圆心和各半径带的平方边界
+        self._cx = 0
+        self._cy = 0
+        self._ring_min2 = 0          # 圆环区域下界（含）
+        self._inner_max2 = -1        # 内环区域上界（含）
+        self._outer_min2 = 0         # 外环区域下界（不含，与内环区域有重叠）
+        self._ring_max2 = -1         # 圆环区域上界（含）
+        self._afternoon_min2 = 0     # 判定为下午（外环）的下界（不含）
+        self._afternoon_max2 = -1    # 判定为下午（外环）的上界（含）
+
+        # 角度分箱 -> 锚点索引，上午和下午两个环首尾相接，共 86400 个分箱；-1 表示没有锚点
+        # 最后一个锚点开始之后的分箱不写入表中，查找时直接返回最后一个锚点
+        self._index = array('i', [-1]) * (2 * RING_SECONDS)
+        self._count = 0
+        self._last_start = 2 * RING_SECONDS
+
+    def set_geometry(self, bounds):
+        """
+        根据渲染器的圆环边界重建半径带
+
+        Args:
+            bounds: ClockRenderer.get_ring_bounds() 的返回值
+        """
+        center = bounds['center']
+        radius = bounds['radius']
+        inner_ring_outer = bounds['inner_ring_outer']
+        outer_ring_outer = bounds['outer_ring_outer']
+
+        self._cx = center.x()
+        self._cy = center.y()
+        self._ring_min2 = (radius - 5) ** 2
+        self._inner_max2 = (inner_ring_outer + 5) ** 2
+        self._outer_min2 = (inner_ring_outer - 2) ** 2
+        self._ring_max2 = (outer_ring_outer + 5) ** 2
+        self._afternoon_min2 = (inner_ring_outer + 2) ** 2
+        self._afternoon_max2 = (outer_ring_outer + 2) ** 2
+
+    def reset(self, anchor_seconds):
+        """由完整的锚点秒数列表重建分箱表，按顺序扫描一遍，每个分箱最多写入一次"""
+        self._index = array('i', [-1]) * (2 * RING_SECONDS)
+        self._count = 0
+        self._last_start = 2 * RING_SECONDS
+        for seconds in anchor_seconds:
+            self.append(seconds)
+
+    def append(self, seconds):
+        """
+        追加一个锚点，从它的开始时间到当天结束的分箱都指向它
+
+        第一个锚点同时覆盖它之前的分箱（与原来的查找规则一致）。
+        只需把上一个锚点新确定的时间段 [上一个锚点的开始, 本锚点的开始) 写入表中。
+        """
+        index = self._count
+        start = 0 if index == 0 else max(0, min(seconds, 2 * RING_SECONDS))
+        if index > 0 and start > self._last_start:
+            self._index[self._last_start:start] = array('i', [index - 1]) * (start - self._last_start)
+        self._last_start = start
+        self._count += 1
+
+    def in_ring(self, x, y):
+        """判断坐标是否在圆环区域内"""
+        dx = x - self._cx
+        dy = y - self._cy
+        d2 = dx * dx + dy * dy
+        return (self._ring_min2 <= d2 <= self._inner_max2 or
+                self._outer_min2 < d2 <= self._ring_max2)
+
+    def target_seconds(self, x, y):
+        """
+        把圆环内的坐标换算为当天的秒数
+
+        Returns:
+            秒数，不在圆环内时返回 -1
+        """
+        dx = x - self._cx
+        dy = y - self._cy
+        d2 = dx * dx + dy * dy
+        if not (self._ring_min2 <= d2 <= self._inner_max2 or
+                self._outer_min2 < d2 <= self._ring_max2):
+            return -1
+
+        angle = (math.degrees(math.atan2(-dy, -dx)) + 270) % 360
+        seconds = min(int((angle / 360) * RING_SECONDS), RING_SECONDS - 1)
+        if self._afternoon_min2 < d2 <= self._afternoon_max2:
+            seconds += RING_SECONDS
+        return seconds
+
+    def index_at(self, seconds):
+        """获取 seconds 所在时间段的锚点索引，没有锚点时返回 -1"""
+        if seconds >= self._last_start:
+            return self._count - 1
+        return self._index[seconds]
@@ -0,0 +1,314 @@
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Optional, Sequence
+
+# 耗时直方图的桶上界（毫秒）
+TIME_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+# 字节数直方图的桶上界
+SIZE_BUCKETS = (1 << 10, 4 << 10, 16 << 10, 64 << 10, 256 << 10, 1 << 20, 4 << 20, 16 << 20)
+
+
+class Histogram:
+    """固定桶的直方图，记录次数、总和与最大值，分位数按桶上界估计"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个桶为 +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        """记录一个观测值（调用方持有锁）"""
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """估计分位数：返回累计次数达到 q 的那个桶的上界（+Inf 桶返回最大值）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target and n:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict:
+        """导出为字典，buckets 为累计次数（与 Prometheus 的 le 桶一致）"""
+        cumulative = []
+        seen = 0
+        for bound, n in zip(list(self.buckets) + ['+Inf'], self.counts):
+            seen += n
+            cumulative.append([bound, seen])
+        return {
+            'count': self.count,
+            'sum': round(self.total, 4),
+            'mean': round(self.total / self.count, 4) if self.count else 0.0,
+            'max': round(self.max, 4),
+            'p50': round(self.quantile(0.50), 4),
+            'p90': round(self.quantile(0.90), 4),
+            'p99': round(self.quantile(0.99), 4),
+            'buckets': cumulative,
+        }
+
+
+class SamplingProfiler:
+    """
+    采样分析器 - 为指定的被测函数采集调用栈，输出可直接交给 flamegraph.pl 的折叠栈格式
+
+    arm() 之后，该函数接下来的若干次调用期间，后台线程按固定间隔读取执行线程的当前栈帧；
+    不在采样中的函数只多一次字典查找。
+    """
+
+    def __init__(self, output_dir: Optional[str] = None):
+        """
+        初始化采样分析器
+
+        Args:
+            output_dir: 采集完成后把折叠栈写入 <output_dir>/<name>.folded，None 表示只保存在内存中
+        """
+        self.output_dir = output_dir
+        self._armed: Dict[str, int] = {}         # 名称 -> 剩余的采样调用次数
+        self._active: Dict[int, str] = {}        # 线程 id -> 正在采样的名称
+        self._stacks: Dict[str, Counter] = {}    # 名称 -> {折叠栈: 采样次数}
+        self._interval = 0.005
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def arm(self, name: str, calls: int = 1, interval: float = 0.005):
+        """
+        为 name 的接下来 calls 次调用采样（之前采集的结果会被清空）
+
+        Args:
+            name: 被测函数的名称（与 timed 使用的名称一致）
+            calls: 采样的调用次数
+            interval: 采样间隔（秒）
+        """
+        with self._lock:
+            self._armed[name] = max(1, calls)
+            self._stacks[name] = Counter()
+            self._interval = max(0.001, interval)
+
+    def disarm(self, name: str):
+        """取消 name 尚未开始的采样"""
+        with self._lock:
+            self._armed.pop(name, None)
+
+    def is_armed(self, name: str) -> bool:
+        return name in self._armed
+
+    def armed(self) -> Dict[str, int]:
+        """当前等待采样的名称及剩余次数"""
+        with self._lock:
+            return dict(self._armed)
+
+    def begin(self, name: str) -> bool:
+        """被测函数开始执行，需要采样时返回 True"""
+        with self._lock:
+            if name not in self._armed:
+                return False
+            self._active[threading.get_ident()] = name
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+                self._thread.start()
+            return True
+
+    def end(self, name: str):
+        """被测函数执行结束，采样次数用完时写出结果"""
+        finished = False
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+            remaining = self._armed.get(name)
+            if remaining is not None:
+                if remaining <= 1:
+                    del self._armed[name]
+                    finished = True
+                else:
+                    self._armed[name] = remaining - 1
+        if finished and self.output_dir:
+            self.dump(name, os.path.join(self.output_dir, f"{name}.folded"))
+
+    def folded(self, name: str) -> str:
+        """
+        获取 name 的折叠栈文本
+
+        Returns:
+            每行为 'frame;frame;...;frame 次数'，按次数从多到少排列
+        """
+        with self._lock:
+            stacks = self._stacks.get(name, Counter())
+            return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def dump(self, name: str, path: str):
+        """把 name 的折叠栈写入文件"""
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self.folded(name))
+        except OSError as e:
+            print(f"写入采样结果时出错: {e}")
+
+    def _run(self):
+        """采样线程：有正在采样的调用时按间隔读取其栈帧，没有时退出"""
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                active = dict(self._active)
+                interval = self._interval
+            frames = sys._current_frames()
+            samples = []
+            for thread_id, name in active.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    samples.append((name, self._fold(frame)))
+            del frames
+            with self._lock:
+                for name, stack in samples:
+                    self._stacks.setdefault(name, Counter())[stack] += 1
+            time.sleep(interval)
+
+    @staticmethod
+    def _fold(frame) -> str:
+        """把栈帧转换为由外到内、以分号连接的折叠栈"""
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        parts.reverse()
+        return ';'.join(parts)
+
+
+class MetricsRegistry:
+    """
+    指标注册表 - 耗时与字节数直方图、计数器，以及按需读取的外部统计（如缓存命中率）
+
+    所有记录操作都只是一次加锁的数值更新，可以常驻在热点路径上。
+    """
+
+    def __init__(self, profile_dir: Optional[str] = None):
+        """
+        初始化指标注册表
+
+        Args:
+            profile_dir: 采样分析结果的输出目录，None 表示只保存在内存中
+        """
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._sources: Dict[str, Callable[[], Dict]] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.profiler = SamplingProfiler(profile_dir)
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = TIME_BUCKETS_MS):
+        """
+        记录一个观测值
+
+        Args:
+            name: 直方图名称
+            value: 观测值（耗时为毫秒，大小为字节）
+            buckets: 首次创建直方图时使用的桶上界
+        """
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def observe_size(self, name: str, nbytes: int):
+        """记录一个字节数观测值"""
+        self.observe(name, nbytes, SIZE_BUCKETS)
+
+    def add(self, name: str, value: float = 1):
+        """计数器加上 value"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def register_source(self, name: str, fn: Callable[[], Dict]):
+        """
+        注册外部统计，导出指标时调用 fn() 读取
+
+        Args:
+            name: 统计名称
+            fn: 返回字典的函数，例如 DayCache.stats
+        """
+        with self._lock:
+            self._sources[name] = fn
+
+    def timed(self, name: str):
+        """
+        装饰器：记录函数每次调用的耗时，并在 name 被采样时采集调用栈
+
+        Args:
+            name: 直方图名称
+        """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                profiling = self.profiler.is_armed(name) and self.profiler.begin(name)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(name, (time.perf_counter() - start) * 1000)
+                    if profiling:
+                        self.profiler.end(name)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> Dict:
+        """
+        导出全部指标
+
+        Returns:
+            包含 uptime、histograms、counters、sources 和 profiling 的字典
+        """
+        with self._lock:
+            histograms = {name: h.to_dict() for name, h in sorted(self._histograms.items())}
+            counters = dict(sorted(self._counters.items()))
+            sources = dict(self._sources)
+        collected = {}
+        for name, fn in sorted(sources.items()):
+            try:
+                collected[name] = fn()
+            except Exception as e:
+                collected[name] = {'error': str(e)}
+        return {
+            'uptime': round(time.time() - self.started_at, 1),
+            'histograms': histograms,
+            'counters': counters,
+            'sources': collected,
+            'profiling': self.profiler.armed(),
+        }
+
+    def reset(self):
+        """清空直方图和计数器（外部统计不受影响）"""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+# 进程内共享的注册表
+registry = MetricsRegistry(os.environ.get('TIMETABLE_PROFILE_DIR'))
+
+
+def timed(name: str):
+    """在共享注册表上记录函数耗时的装饰器，见 MetricsRegistry.timed"""
+    return registry.timed(name)
+
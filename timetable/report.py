@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+时间数据命令行报表：按事件统计总时长，并按星期几细分
+
+无需启动可视化应用即可分析多年的历史数据。数据逐天流式读取，
+日期按连续分片交给多个进程分别汇总后再合并。
+
+用法示例：
+    python report.py --start 2025-01-01 --end 2025-12-31
+    python report.py --format csv --output report.csv --workers 4
+    python report.py --db ../time_data/timedata.db --format json
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from data_manager import DataManager
+from storage import get_data_dir
+from storage_backends import SqliteBackend
+
+WEEKDAY_NAMES = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+
+
+def create_data_manager(data_dir: str, db_path: Optional[str] = None) -> DataManager:
+    """
+    创建报表使用的数据管理器
+
+    Args:
+        data_dir: JSON 数据目录
+        db_path: SQLite 数据库路径，指定时使用 SQLite 后端
+
+    Returns:
+        DataManager 实例
+    """
+    backend = SqliteBackend(db_path) if db_path else None
+    return DataManager(data_dir, backend=backend)
+
+
+def aggregate_shard(data_dir: str, db_path: Optional[str], start_date: str, end_date: str) -> Dict[str, List[float]]:
+    """
+    汇总一个日期分片（供进程池调用）
+
+    Args:
+        data_dir: JSON 数据目录
+        db_path: SQLite 数据库路径
+        start_date: 分片的开始日期
+        end_date: 分片的结束日期
+
+    Returns:
+        字典，键为事件名，值为长度为 7 的列表（周一到周日的小时数）
+    """
+    data_manager = create_data_manager(data_dir, db_path)
+    totals = {}
+    weekdays = {}
+    for interval in data_manager.iter_intervals(start_date, end_date):
+        date = interval['date']
+        weekday = weekdays.get(date)
+        if weekday is None:
+            weekday = weekdays[date] = datetime.strptime(date, "%Y-%m-%d").weekday()
+        row = totals.get(interval['event'])
+        if row is None:
+            row = totals[interval['event']] = [0.0] * 7
+        row[weekday] += interval['duration']
+    return totals
+
+
+def merge_totals(target: Dict[str, List[float]], source: Dict[str, List[float]]):
+    """把一个分片的汇总结果合并到 target 中"""
+    for event, row in source.items():
+        merged = target.get(event)
+        if merged is None:
+            target[event] = list(row)
+        else:
+            for i in range(7):
+                merged[i] += row[i]
+
+
+def split_shards(dates: List[str], shard_count: int) -> List[List[str]]:
+    """把日期列表切分为 shard_count 个连续的分片"""
+    size = max(1, -(-len(dates) // max(1, shard_count)))
+    return [dates[i:i + size] for i in range(0, len(dates), size)]
+
+
+def build_report(data_dir: str, db_path: Optional[str] = None, start_date: Optional[str] = None,
+                 end_date: Optional[str] = None, workers: int = 1) -> Dict:
+    """
+    生成报表
+
+    Args:
+        data_dir: JSON 数据目录
+        db_path: SQLite 数据库路径
+        start_date: 开始日期，默认为最早的日期
+        end_date: 结束日期，默认为最晚的日期
+        workers: 进程数，1 表示在当前进程中汇总
+
+    Returns:
+        字典，包含 start、end、days 和 events（每个事件的 total 与 weekdays）
+    """
+    data_manager = create_data_manager(data_dir, db_path)
+    dates = data_manager.backend.dates_between(start_date or '0000-00-00', end_date or '9999-99-99')
+
+    totals = {}
+    if workers <= 1 or len(dates) <= 1:
+        if dates:
+            merge_totals(totals, aggregate_shard(data_dir, db_path, dates[0], dates[-1]))
+    else:
+        shards = split_shards(dates, workers * 4)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(aggregate_shard, data_dir, db_path, shard[0], shard[-1])
+                       for shard in shards]
+            # 按分片顺序合并，结果不受进程完成先后影响
+            for future in futures:
+                merge_totals(totals, future.result())
+
+    events = {
+        event: {'total': sum(row), 'weekdays': row}
+        for event, row in sorted(totals.items(), key=lambda item: -sum(item[1]))
+    }
+    return {
+        'start': dates[0] if dates else start_date,
+        'end': dates[-1] if dates else end_date,
+        'days': len(dates),
+        'events': events
+    }
+
+
+def write_report(report: Dict, fmt: str, out):
+    """
+    按指定格式输出报表
+
+    Args:
+        report: build_report 的返回值
+        fmt: 'table'、'csv' 或 'json'
+        out: 输出文件对象
+    """
+    if fmt == 'json':
+        json.dump(report, out, ensure_ascii=False, indent=2)
+        out.write('\n')
+        return
+
+    if fmt == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(['事件', '总时长(小时)'] + WEEKDAY_NAMES)
+        for event, item in report['events'].items():
+            writer.writerow([event, f"{item['total']:.4f}"] + [f"{hours:.4f}" for hours in item['weekdays']])
+        return
+
+    out.write(f"日期范围: {report['start']} 至 {report['end']}（{report['days']} 天）\n")
+    header = f"{'事件':<12}{'总计':>9}" + ''.join(f"{name:>8}" for name in WEEKDAY_NAMES)
+    out.write(header + '\n')
+    for event, item in report['events'].items():
+        out.write(f"{event:<12}{item['total']:>9.2f}" + ''.join(f"{hours:>10.2f}" for hours in item['weekdays']) + '\n')
+
+
+def main(argv=None):
+    """主函数"""
+    parser = argparse.ArgumentParser(description="时间数据报表：按事件和星期几统计时长")
+    parser.add_argument("--start", help="开始日期 YYYY-MM-DD，默认为最早的日期")
+    parser.add_argument("--end", help="结束日期 YYYY-MM-DD，默认为最晚的日期")
+    parser.add_argument("--data-dir", default=None, help="JSON 数据目录，默认为统一的数据根目录")
+    parser.add_argument("--db", default=None, help="SQLite 数据库路径，指定时从数据库读取")
+    parser.add_argument("--format", choices=["table", "csv", "json"], default="table", help="输出格式")
+    parser.add_argument("--output", help="输出文件，默认为标准输出")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="汇总使用的进程数，1 表示单进程")
+    args = parser.parse_args(argv)
+
+    report = build_report(args.data_dir or get_data_dir(), args.db, args.start, args.end, args.workers)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            write_report(report, args.format, f)
+    else:
+        write_report(report, args.format, sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from day_columns import DayColumns, EventTable
+from storage_backends import StorageBackend
+
+# 24 个整点边界（秒）
+HOUR_EDGES = np.arange(25, dtype=np.int64) * 3600
+
+
+def _normalize_version(version):
+    """把版本标识转换为可以和 JSON 读回的值直接比较的形式"""
+    return json.loads(json.dumps(version))
+
+
+def compute_rollup(records: List[Dict], day_end: int) -> Dict:
+    """
+    计算一天的汇总：每个事件的总秒数和按小时分布的秒数
+
+    Args:
+        records: 原始数据列表，每个元素包含 time 和 event
+        day_end: 最后一个事件的结束秒数
+
+    Returns:
+        字典，events 为 {事件名: 秒数}，hours 为 {事件名: 24 个整点区间内的秒数}
+    """
+    table = EventTable()
+    columns = DayColumns.from_records('', records, table, day_end)
+    if not len(columns):
+        return {'events': {}, 'hours': {}}
+
+    starts = columns.starts.astype(np.int64)
+    ends = columns.ends.astype(np.int64)
+    valid = (starts >= 0) & (ends >= 0)
+
+    totals = np.bincount(columns.event_ids, weights=columns.durations, minlength=len(table))
+
+    # 每个事件与每个整点区间的重叠秒数（n x 24）
+    overlap = np.minimum(ends[:, None], HOUR_EDGES[None, 1:]) - np.maximum(starts[:, None], HOUR_EDGES[None, :-1])
+    overlap = np.where(valid[:, None], np.clip(overlap, 0, None), 0)
+    hours = np.zeros((len(table), 24), dtype=np.int64)
+    np.add.at(hours, columns.event_ids, overlap)
+
+    return {
+        'events': {name: int(totals[i]) for i, name in enumerate(table.names)},
+        'hours': {name: hours[i].tolist() for i, name in enumerate(table.names)},
+    }
+
+
+def _compute_stored_rollup(backend: StorageBackend, date: str) -> Optional[Dict]:
+    """
+    读取并计算某个过去日期的汇总（供进程池调用）
+
+    Args:
+        backend: 存储后端
+        date: 日期字符串
+
+    Returns:
+        带版本号的汇总，读取失败时返回 None
+    """
+    try:
+        version = backend.day_version(date)
+        rollup = compute_rollup(backend.load_day(date), 86399)
+    except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+        print(f"计算 {date} 的汇总时出错: {e}")
+        return None
+    rollup['version'] = _normalize_version(version)
+    return rollup
+
+
+class RollupIndex:
+    """
+    每日汇总索引，保存在数据目录下的 rollups.json
+
+    过去的日期按数据版本增量更新；今天的数据仍在变化，每次查询时现算，不落盘。
+    存储的变化标识（见 StorageBackend.change_token）不变时跳过逐天的版本校验，
+    查询的开销与历史天数无关。
+    """
+
+    FORMAT = 1
+
+    def __init__(self, backend: StorageBackend, path: str, refresh_interval: float = 5.0,
+                 full_check_interval: float = 300.0):
+        """
+        初始化汇总索引
+
+        Args:
+            backend: 存储后端
+            path: 索引文件路径
+            refresh_interval: 两次检查之间的最短间隔（秒）
+            full_check_interval: 变化标识不变时，逐天校验版本的最长间隔（秒），兜底发现原地修改的文件
+        """
+        self.backend = backend
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.full_check_interval = full_check_interval
+
+        self._days: Dict[str, Dict] = {}
+        self._dates: List[str] = []
+        self._lock = threading.RLock()
+        self._last_refresh = None
+        self._last_full_check = None
+        self._token = None
+        self._token_day = None
+        self._load()
+
+    def _load(self):
+        """读取索引文件"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"读取汇总索引 {self.path} 时出错: {e}")
+            return
+        if index.get('format') == self.FORMAT:
+            self._days = index.get('days', {})
+            self._dates = sorted(self._days)
+
+    def _save(self):
+        """通过临时文件 + os.replace 原子地写回索引文件"""
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'format': self.FORMAT, 'days': self._days}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"保存汇总索引 {self.path} 时出错: {e}")
+
+    def refresh(self, force: bool = False) -> int:
+        """
+        增量更新：只重新计算版本发生变化的过去日期
+
+        Args:
+            force: 忽略 refresh_interval 立即校验
+
+        Returns:
+            重新计算的天数
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._last_refresh is not None and now - self._last_refresh < self.refresh_interval:
+                return 0
+            self._last_refresh = now
+
+            today = datetime.now().strftime("%Y-%m-%d")
+            try:
+                token = self.backend.change_token()
+            except (OSError, sqlite3.Error):
+                token = None
+            # 变化标识和日期都没变时，过去日期的数据不可能变化
+            if (not force and token is not None and token == self._token and today == self._token_day
+                    and now - self._last_full_check < self.full_check_interval):
+                return 0
+
+            try:
+                dates = [date for date in self.backend.list_dates() if date < today]
+            except (OSError, sqlite3.Error) as e:
+                print(f"读取日期列表时出错: {e}")
+                return 0
+            changed = False
+
+            for date in set(self._days) - set(dates):
+                del self._days[date]
+                changed = True
+
+            updated = 0
+            for date in dates:
+                stored = self._days.get(date)
+                try:
+                    version = _normalize_version(self.backend.day_version(date))
+                except (OSError, sqlite3.Error) as e:
+                    print(f"读取 {date} 的版本时出错: {e}")
+                    continue
+                if stored is not None and stored.get('version') == version:
+                    continue
+                rollup = _compute_stored_rollup(self.backend, date)
+                if rollup is not None:
+                    self._days[date] = rollup
+                    updated += 1
+                    changed = True
+
+            if changed:
+                self._dates = sorted(self._days)
+                self._save()
+                # 索引文件可能与数据在同一目录，写入它本身会改变变化标识，下次再确认一次
+                token = None
+            self._token = token
+            self._token_day = today
+            self._last_full_check = now
+            return updated
+
+    def rebuild(self, max_workers: Optional[int] = None) -> int:
+        """
+        丢弃现有索引，用进程池并行重新计算所有过去日期
+
+        Args:
+            max_workers: 进程数，默认为 CPU 核数
+
+        Returns:
+            计算的天数
+        """
+        today = datetime.now().strftime("%Y-%m-%d")
+        dates = [date for date in self.backend.list_dates() if date < today]
+
+        days = {}
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            backends = [self.backend] * len(dates)
+            for date, rollup in zip(dates, executor.map(_compute_stored_rollup, backends, dates, chunksize=32)):
+                if rollup is not None:
+                    days[date] = rollup
+
+        with self._lock:
+            self._days = days
+            self._dates = sorted(days)
+            self._save()
+            self._last_refresh = time.monotonic()
+        return len(days)
+
+    def _iter_rollups(self, start_date: str, end_date: str):
+        """依次产出闭区间内每天的 (日期, 汇总)，今天的汇总现算"""
+        self.refresh()
+        with self._lock:
+            lo = bisect_left(self._dates, start_date)
+            hi = bisect_right(self._dates, end_date)
+            items = [(date, self._days[date]) for date in self._dates[lo:hi]]
+        yield from items
+
+        now = datetime.now()
+        today = now.strftime("%Y-%m-%d")
+        if start_date <= today <= end_date:
+            try:
+                records = self.backend.load_day(today)
+            except (OSError, ValueError, sqlite3.Error) as e:
+                print(f"加载 {today} 的数据时出错: {e}")
+                records = []
+            if records:
+                yield today, compute_rollup(records, now.hour * 3600 + now.minute * 60 + now.second)
+
+    def event_totals(self, start_date: str, end_date: str) -> Dict[str, float]:
+        """
+        汇总闭区间内每个事件的总时长
+
+        Args:
+            start_date: 开始日期，格式为 'YYYY-MM-DD'
+            end_date: 结束日期，格式为 'YYYY-MM-DD'
+
+        Returns:
+            字典，键为事件名，值为总时长（小时）
+        """
+        totals = {}
+        for _, rollup in self._iter_rollups(start_date, end_date):
+            for name, seconds in rollup['events'].items():
+                totals[name] = totals.get(name, 0) + seconds
+        return {name: seconds / 3600 for name, seconds in totals.items()}
+
+    def hour_histogram(self, start_date: str, end_date: str, event: Optional[str] = None) -> List[float]:
+        """
+        汇总闭区间内 24 个整点区间的时长分布
+
+        Args:
+            start_date: 开始日期
+            end_date: 结束日期
+            event: 只统计该事件，默认为全部事件
+
+        Returns:
+            长度为 24 的列表，每个元素为该整点区间内的总时长（小时）
+        """
+        histogram = [0] * 24
+        for _, rollup in self._iter_rollups(start_date, end_date):
+            hours = rollup['hours']
+            if event is None:
+                buckets = hours.values()
+            else:
+                buckets = [hours[event]] if event in hours else []
+            for bucket in buckets:
+                for h in range(24):
+                    histogram[h] += bucket[h]
+        return [seconds / 3600 for seconds in histogram]
+
+    def period_totals(self, start_date: str, end_date: str, period: str = 'week',
+                      event: Optional[str] = None) -> Dict[str, float]:
+        """
+        按周或按月汇总时长
+
+        Args:
+            start_date: 开始日期
+            end_date: 结束日期
+            period: 'week'（键为 'YYYY-Www'）或 'month'（键为 'YYYY-MM'）
+            event: 只统计该事件，默认为全部事件
+
+        Returns:
+            字典，键为周期，值为总时长（小时）
+        """
+        totals = {}
+        for date, rollup in self._iter_rollups(start_date, end_date):
+            if period == 'month':
+                key = date[:7]
+            else:
+                year, week, _ = datetime.strptime(date, "%Y-%m-%d").isocalendar()
+                key = f"{year}-W{week:02d}"
+            events = rollup['events']
+            seconds = events.get(event, 0) if event is not None else sum(events.values())
+            totals[key] = totals.get(key, 0) + seconds
+        return {key: seconds / 3600 for key, seconds in totals.items()}
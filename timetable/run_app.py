@@ -15,7 +15,7 @@ def main():
     try:
         # 导入必要的模块
         from data_manager import DataManager
-        from app import app
+        from app import app, start_notifier
         
         print("=" * 50)
         print("时间管理可视化应用")
@@ -40,6 +40,7 @@ def main():
         print("=" * 50)
         
         # 启动应用
+        start_notifier(debug=True)
         app.run(debug=True, host='127.0.0.1', port=8050)
         
     except ImportError as e:
@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+
+class SegmentCache:
+    """按 (日期, 文件版本) 记忆每天柱状图色段的 LRU 缓存"""
+
+    def __init__(self, max_entries: int = 400):
+        """
+        初始化色段缓存
+
+        Args:
+            max_entries: 最多缓存的天数，超出后按最近最少使用淘汰
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, date: str, version: Hashable) -> Optional[List[tuple]]:
+        """
+        获取某一天的色段
+
+        Args:
+            date: 日期字符串
+            version: 该日期当前的文件版本
+
+        Returns:
+            版本一致时返回缓存的色段列表，否则返回 None
+        """
+        with self._lock:
+            cached = self._entries.get(date)
+            if cached is None or cached[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(date)
+            self.hits += 1
+            return cached[1]
+
+    def put(self, date: str, version: Hashable, segments: List[tuple]):
+        """
+        写入某一天的色段
+
+        Args:
+            date: 日期字符串
+            version: 计算色段时的文件版本
+            segments: 色段列表
+        """
+        with self._lock:
+            self._entries[date] = (version, segments)
+            self._entries.move_to_end(date)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            包含命中、未命中、淘汰次数和条目数的字典
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+            }
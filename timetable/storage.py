@@ -0,0 +1,457 @@
+import itertools
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+
+from background_writer import BackgroundWriter, write_json_atomic
+from day_cache import DayCache
+from event_journal import EventJournal
+from storage_backends import JsonFileBackend, SqliteBackend, StorageBackend
+
+# 数据根目录的环境变量，未设置时使用项目根目录下的 time_data
+DATA_DIR_ENV = "TIMETABLE_DATA_DIR"
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "time_data")
+# 存储后端的环境变量：json（默认）或 sqlite；SQLite 数据库路径默认为数据根目录下的 timedata.db
+BACKEND_ENV = "TIMETABLE_BACKEND"
+DB_PATH_ENV = "TIMETABLE_DB"
+# 旧版时钟窗口把数据写在启动目录下的 time_data（通常为 timetable/time_data），统一数据根目录后需要合并过来
+LEGACY_DATA_DIR_NAME = "time_data"
+MIGRATION_RECORD = "migrated.json"
+
+
+def get_data_dir() -> str:
+    """
+    获取数据根目录（绝对路径），与当前工作目录无关
+
+    Returns:
+        环境变量 TIMETABLE_DATA_DIR 指定的目录，未设置时为项目根目录下的 time_data
+    """
+    return os.path.abspath(os.environ.get(DATA_DIR_ENV) or DEFAULT_DATA_DIR)
+
+
+def create_backend(data_dir: str) -> StorageBackend:
+    """
+    按环境变量 TIMETABLE_BACKEND 创建存储后端
+
+    Args:
+        data_dir: 数据根目录
+
+    Returns:
+        JSON 文件后端（默认），或 TIMETABLE_DB 指定的 SQLite 后端（默认为数据根目录下的 timedata.db）
+    """
+    kind = (os.environ.get(BACKEND_ENV) or "json").strip().lower()
+    if kind == "sqlite":
+        os.makedirs(data_dir, exist_ok=True)
+        return SqliteBackend(os.path.abspath(os.environ.get(DB_PATH_ENV) or os.path.join(data_dir, "timedata.db")))
+    if kind != "json":
+        print(f"未知的存储后端 {BACKEND_ENV}={kind}，使用 JSON 文件后端")
+    return JsonFileBackend(data_dir)
+
+
+def get_legacy_data_dirs(data_dir: str) -> List[str]:
+    """
+    获取旧版时钟窗口可能使用过的数据目录（不含数据根目录本身）
+
+    Args:
+        data_dir: 数据根目录
+
+    Returns:
+        存在的旧数据目录列表
+    """
+    candidates = [
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), LEGACY_DATA_DIR_NAME),
+        os.path.abspath(LEGACY_DATA_DIR_NAME),
+    ]
+    dirs = []
+    for path in candidates:
+        if os.path.isdir(path) and path not in dirs and os.path.realpath(path) != os.path.realpath(data_dir):
+            dirs.append(path)
+    return dirs
+
+
+def merge_day_records(current: List[Dict], legacy: List[Dict]) -> List[Dict]:
+    """
+    把旧目录中某一天的记录合并进当前数据
+
+    当前数据中已有的记录（按出现次数计）不再重复添加，同一秒内的多条记录都会保留；结果按时间排序。
+
+    Args:
+        current: 数据根目录中的记录
+        legacy: 旧目录中的记录
+
+    Returns:
+        合并后的记录列表
+    """
+    remaining = Counter((record['time'], record['event']) for record in current)
+    merged = list(current)
+    for record in legacy:
+        key = (record['time'], record['event'])
+        if remaining[key]:
+            remaining[key] -= 1
+        else:
+            merged.append(record)
+    merged.sort(key=lambda record: record['time'])
+    return merged
+
+
+def migrate_legacy_data(engine: 'StorageEngine') -> int:
+    """
+    把旧版时钟窗口数据目录中的每日数据合并到数据根目录
+
+    已合并过且之后没有变化的旧文件记录在数据根目录下的 migrated.json 中，不会重复合并；
+    旧目录中的文件保持不变。
+
+    Args:
+        engine: 数据根目录的存储引擎
+
+    Returns:
+        合并的天数
+    """
+    record_path = os.path.join(engine.data_dir, MIGRATION_RECORD)
+    try:
+        with open(record_path, 'r', encoding='utf-8') as f:
+            migrated = json.load(f)
+    except (OSError, ValueError):
+        migrated = {}
+
+    changed_days = 0
+    updated = False
+    for legacy_dir in get_legacy_data_dirs(engine.data_dir):
+        legacy = JsonFileBackend(legacy_dir)
+        for name in sorted(os.listdir(legacy_dir)):
+            if not (name.startswith("timedata_") and name.endswith(".json")):
+                continue
+            path = os.path.join(legacy_dir, name)
+            date = name[len("timedata_"):-len(".json")]
+            try:
+                st = os.stat(path)
+                stamp = [st.st_mtime_ns, st.st_size]
+                if migrated.get(path) == stamp:
+                    continue
+                current = engine.backend.load_day(date)
+                merged = merge_day_records(current, legacy.load_day(date))
+                if len(merged) != len(current):
+                    engine.save_day(date, merged)
+                    changed_days += 1
+                migrated[path] = stamp
+                updated = True
+            except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+                print(f"合并旧数据文件 {path} 时出错: {e}")
+
+    if updated:
+        try:
+            write_json_atomic(record_path, migrated)
+        except OSError as e:
+            print(f"写入 {record_path} 时出错: {e}")
+    if changed_days:
+        print(f"已把旧数据目录中 {changed_days} 天的数据合并到 {engine.data_dir}")
+    return changed_days
+
+
+def _load_day_worker(backend: StorageBackend, date: str) -> Tuple[str, Optional[Hashable], List[Dict]]:
+    """
+    在子进程中读取并解析某一天的数据（供进程池调用）
+
+    Args:
+        backend: 存储后端
+        date: 日期字符串
+
+    Returns:
+        (日期, 版本, 数据)，读取失败时版本为 None、数据为空列表
+    """
+    try:
+        version = backend.day_version(date)
+        if version is None:
+            return date, None, []
+        return date, version, backend.load_day(date)
+    except (json.JSONDecodeError, OSError, sqlite3.Error) as e:
+        print(f"加载 {date} 的数据时出错: {e}")
+        return date, None, []
+
+
+class StorageEngine:
+    """
+    统一的存储引擎 - 时钟窗口和可视化应用共用的读写路径
+
+    读：存储后端 + 按数据版本校验的 DayCache；
+    写：整体写入经后端原子写入，追加事件在 JSON 后端下写入事件日志，
+    需要异步时交给 BackgroundWriter 在写线程上执行。
+    """
+
+    def __init__(self, data_dir: Optional[str] = None, backend: Optional[StorageBackend] = None,
+                 cache_max_bytes: int = 64 * 1024 * 1024):
+        """
+        初始化存储引擎
+
+        Args:
+            data_dir: 数据根目录，默认为 get_data_dir()
+            backend: 存储后端，默认为 data_dir 下的 JSON 文件后端
+            cache_max_bytes: 数据缓存的内存预算（字节）
+        """
+        self.data_dir = data_dir if data_dir is not None else get_data_dir()
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.backend = backend if backend is not None else JsonFileBackend(self.data_dir)
+        # 缓存已读取的数据（含列式数据），按数据版本校验并按 LRU 淘汰
+        self.cache = DayCache(max_bytes=cache_max_bytes)
+
+        self._lock = threading.Lock()
+        self._writer: Optional[BackgroundWriter] = None
+        self._journals: Dict[str, EventJournal] = {}
+        self._append_seq = itertools.count()
+
+    @property
+    def writer(self) -> BackgroundWriter:
+        """后台写线程，首次需要异步写入时启动"""
+        with self._lock:
+            if self._writer is None:
+                self._writer = BackgroundWriter()
+            return self._writer
+
+    def get_day_file(self, date: str) -> str:
+        """获取指定日期的 JSON 数据文件路径"""
+        return os.path.join(self.data_dir, f"timedata_{date}.json")
+
+    def list_dates(self) -> List[str]:
+        """所有有数据的日期（升序）"""
+        return self.backend.list_dates()
+
+    def day_version(self, date: str) -> Optional[Hashable]:
+        """某一天数据的版本标识，没有数据时为 None"""
+        return self.backend.day_version(date)
+
+    def day_counter(self, date: str) -> int:
+        """某一天单调递增的版本号，每次写入都会增加"""
+        return self.backend.day_counter(date)
+
+    def changed_since(self, date: str, counter: int) -> bool:
+        """
+        某一天在版本号 counter 之后是否有新的写入（只检查版本号，不读取数据）
+
+        Args:
+            date: 日期字符串
+            counter: 之前通过 day_counter 得到的版本号
+
+        Returns:
+            有新的写入时返回 True
+        """
+        return self.backend.changed_since(date, counter)
+
+    def load_day(self, date: str) -> List[Dict]:
+        """
+        读取指定日期的数据，版本未变化时直接返回缓存
+
+        返回的列表与缓存共享，调用方需要修改时应先复制。
+
+        Args:
+            date: 日期字符串，格式为 'YYYY-MM-DD'
+
+        Returns:
+            该日期的数据列表，每个元素包含 time 和 event
+        """
+        previous = self.cache.peek(date)
+        entry = self.cache.lookup(date, lambda: self.backend.day_version(date))
+        if entry is not None:
+            return entry.data
+
+        try:
+            # 先取版本再读数据：读取期间若有写入，下次校验时会发现版本不一致
+            version = self.backend.day_version(date)
+            if version is None:
+                return []
+            data = self.backend.load_day(date)
+            self.cache.put(date, version, data)
+            return data
+        except TimeoutError as e:
+            # 写入方持续修改这一天，退回到上一次读到的一致数据
+            print(f"加载 {date} 的数据时出错: {e}")
+            return previous.data if previous is not None else []
+        except (json.JSONDecodeError, FileNotFoundError, sqlite3.Error) as e:
+            print(f"加载 {date} 的数据时出错: {e}")
+            return []
+
+    def load_range(self, start_date: str, end_date: str) -> Dict[str, List[Dict]]:
+        """
+        读取闭区间 [start_date, end_date] 内所有日期的数据，未命中缓存的日期一次性从后端读取
+
+        Args:
+            start_date: 开始日期，格式为 'YYYY-MM-DD'
+            end_date: 结束日期，格式为 'YYYY-MM-DD'
+
+        Returns:
+            字典，键为日期，值为该日期的数据列表
+        """
+        try:
+            dates = self.backend.dates_between(start_date, end_date)
+            range_data = {}
+            missing = []
+            for date in dates:
+                entry = self.cache.lookup(date, lambda: self.backend.day_version(date))
+                if entry is not None:
+                    range_data[date] = entry.data
+                else:
+                    missing.append(date)
+
+            if missing:
+                versions = {date: self.backend.day_version(date) for date in missing}
+                loaded = self.backend.load_range(missing[0], missing[-1])
+                for date in missing:
+                    data = loaded.get(date, [])
+                    if versions[date] is not None:
+                        self.cache.put(date, versions[date], data)
+                    range_data[date] = data
+        except (json.JSONDecodeError, FileNotFoundError, TimeoutError, sqlite3.Error) as e:
+            print(f"加载 {start_date} 至 {end_date} 的数据时出错: {e}")
+            return {}
+        return {date: range_data[date] for date in dates}
+
+    def iter_days(self, dates: List[str], max_workers: Optional[int] = None,
+                  use_processes: bool = False, ordered: bool = True) -> Iterator[Tuple[str, List[Dict]]]:
+        """
+        并行读取多天的数据，边读边产出
+
+        线程池适合 I/O 为主的场景（慢盘、网络盘）；进程池在子进程中解析 JSON，适合解析为主的场景，
+        读取结果回到本进程后写入缓存。已在缓存中且版本未变的日期不会重新读取。
+
+        Args:
+            dates: 日期列表
+            max_workers: 并发数，默认为执行器的默认值
+            use_processes: 使用进程池而不是线程池
+            ordered: True 时按 dates 的顺序产出；False 时按完成顺序产出，首批数据更快可用
+
+        Yields:
+            (日期, 该日期的数据列表)
+        """
+        if not dates:
+            return
+
+        if not use_processes:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                if ordered:
+                    yield from zip(dates, executor.map(self.load_day, dates))
+                else:
+                    futures = {executor.submit(self.load_day, date): date for date in dates}
+                    for future in as_completed(futures):
+                        yield futures[future], future.result()
+            return
+
+        # 进程池：先在本进程查缓存，只把未命中的日期交给子进程
+        cached = {}
+        missing = []
+        for date in dates:
+            entry = self.cache.lookup(date, lambda: self.backend.day_version(date))
+            if entry is not None:
+                cached[date] = entry.data
+            else:
+                missing.append(date)
+        if not ordered:
+            yield from cached.items()
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            backends = [self.backend] * len(missing)
+            if ordered:
+                loaded = executor.map(_load_day_worker, backends, missing, chunksize=8)
+            else:
+                loaded = (future.result() for future in
+                          as_completed([executor.submit(_load_day_worker, self.backend, date) for date in missing]))
+
+            pending = iter(dates) if ordered else None
+            for date, version, data in loaded:
+                if version is not None:
+                    self.cache.put(date, version, data)
+                if not ordered:
+                    yield date, data
+                    continue
+                # 按顺序产出：先产出排在它前面的缓存命中的日期
+                for next_date in pending:
+                    if next_date == date:
+                        yield date, data
+                        break
+                    yield next_date, cached[next_date]
+            if ordered:
+                for next_date in pending:
+                    yield next_date, cached[next_date]
+
+    def save_day(self, date: str, data: List[Dict]):
+        """
+        整体写入某一天的数据（同步）
+
+        Args:
+            date: 日期字符串
+            data: 数据列表
+        """
+        self.backend.save_day(date, data)
+        self.cache.invalidate(date)
+
+    def save_day_async(self, date: str, data: List[Dict]):
+        """
+        在写线程上整体写入某一天的数据，同一天尚未执行的写入只保留最新的数据
+
+        Args:
+            date: 日期字符串
+            data: 数据列表（调用方不应再修改它）
+        """
+        self.writer.submit(('save_day', date), lambda: self.save_day(date, data))
+
+    def journal_for(self, date: str) -> EventJournal:
+        """获取某一天的事件日志（JSON 后端），追加和压缩都在写线程上执行"""
+        writer = self.writer
+        with self._lock:
+            journal = self._journals.get(date)
+            if journal is None:
+                journal = EventJournal(self.get_day_file(date), writer=writer)
+                self._journals[date] = journal
+            return journal
+
+    def append_event(self, date: str, record: Dict):
+        """
+        追加一条锚点记录，调用方只入队，不等待写入完成
+
+        JSON 后端写入当天的事件日志；其他后端在写线程上调用 append_event。
+
+        Args:
+            date: 日期字符串
+            record: 记录，包含 time 和 event
+        """
+        if isinstance(self.backend, JsonFileBackend):
+            self.journal_for(date).append(record)
+        else:
+            # 每条追加都是独立的任务，不能合并
+            key = ('append_event', date, next(self._append_seq))
+            self.writer.submit(key, lambda: self.backend.append_event(date, record))
+
+    def close_journal(self, date: str):
+        """停止某一天的日志计时，在写线程上把它合并回快照文件"""
+        with self._lock:
+            journal = self._journals.pop(date, None)
+        if journal is not None:
+            journal.cancel()
+            journal.request_compaction()
+
+    def flush(self):
+        """合并所有日志并等待写线程写完，之后不再接受异步写入（退出前调用）"""
+        with self._lock:
+            dates = list(self._journals)
+        for date in dates:
+            self.close_journal(date)
+        if self._writer is not None:
+            self._writer.close()
+
+
+_default_engine: Optional[StorageEngine] = None
+_default_engine_lock = threading.Lock()
+
+
+def get_engine() -> StorageEngine:
+    """获取本进程共享的默认存储引擎（数据根目录为 get_data_dir()，存储后端见 create_backend）"""
+    global _default_engine
+    with _default_engine_lock:
+        if _default_engine is None:
+            data_dir = get_data_dir()
+            _default_engine = StorageEngine(data_dir, create_backend(data_dir))
+            if not os.environ.get(DATA_DIR_ENV):
+                migrate_legacy_data(_default_engine)
+        return _default_engine
@@ -0,0 +1,410 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Hashable, List, Optional
+
+from background_writer import write_json_atomic
+from date_manifest import DateManifest
+from event_journal import (bump_version, get_journal_path, get_marker_path, get_version_path, load_with_journal,
+                           read_version)
+from metrics import registry
+
+
+def time_to_seconds(time_str: str) -> int:
+    """
+    把 'HH:MM:SS' 转换为当天的秒数
+
+    Args:
+        time_str: 时间字符串
+
+    Returns:
+        秒数
+    """
+    h, m, s = map(int, time_str.split(':'))
+    return h * 3600 + m * 60 + s
+
+
+class StorageBackend(ABC):
+    """存储后端接口，DataManager 通过它读写每天的锚点数据"""
+
+    @abstractmethod
+    def list_dates(self) -> List[str]:
+        """返回所有有数据的日期（升序）"""
+
+    def recent_dates(self, days: int) -> List[str]:
+        """返回最近 days 个有数据的日期（升序）"""
+        dates = self.list_dates()
+        return dates[-days:] if days > 0 else []
+
+    def dates_between(self, start_date: str, end_date: str) -> List[str]:
+        """返回闭区间 [start_date, end_date] 内有数据的日期（升序）"""
+        return [date for date in self.list_dates() if start_date <= date <= end_date]
+
+    @abstractmethod
+    def day_version(self, date: str) -> Optional[Hashable]:
+        """返回某一天数据的版本标识，数据变化时版本随之变化；不存在时返回 None"""
+
+    @abstractmethod
+    def day_counter(self, date: str) -> int:
+        """返回某一天单调递增的版本号，每次写入都会增加；从未写入过时为 0"""
+
+    def changed_since(self, date: str, counter: int) -> bool:
+        """某一天的数据在版本号 counter 之后是否有新的写入，无需重新读取数据"""
+        return self.day_counter(date) != counter
+
+    def change_token(self) -> Optional[Hashable]:
+        """返回整个存储的变化标识，任何一天的数据变化时随之变化；无法廉价判断时返回 None"""
+        return None
+
+    @abstractmethod
+    def load_day(self, date: str) -> List[Dict]:
+        """读取某一天的数据，不存在时返回空列表"""
+
+    def load_range(self, start_date: str, end_date: str) -> Dict[str, List[Dict]]:
+        """读取闭区间 [start_date, end_date] 内所有日期的数据"""
+        return {date: self.load_day(date) for date in self.dates_between(start_date, end_date)}
+
+    @abstractmethod
+    def save_day(self, date: str, data: List[Dict]):
+        """整体写入某一天的数据"""
+
+    def append_event(self, date: str, record: Dict):
+        """追加一条锚点记录，默认读出整天数据后整体写回"""
+        self.save_day(date, self.load_day(date) + [record])
+
+
+class JsonFileBackend(StorageBackend):
+    """
+    JSON 文件存储后端：每天一个 timedata_YYYY-MM-DD.json 文件，日期列表来自目录清单
+
+    每天的版本号保存在 timedata_YYYY-MM-DD.version（见 event_journal.bump_version）。
+    写入方通过临时文件 + os.replace 替换快照，并在写入后递增版本号；读取方不加锁，
+    读取前后版本号不一致或为奇数（正在压缩日志）时退避后重读，因此不会阻塞写入方，也不会读到不一致的数据。
+    """
+
+    # 读到无法解析的快照时的最多重读次数，仍然失败说明文件本身已损坏
+    READ_RETRIES = 5
+    # 读取期间遇到写入时的退避上限（秒），以及等待一致版本的最长时间（秒）
+    READ_BACKOFF_MAX = 0.1
+    READ_TIMEOUT = 10.0
+    # 版本号为奇数且这么多秒没有变化时，认为写入方在中途崩溃，数据由压缩标记恢复，可以直接读取
+    STALE_WRITE_SECONDS = 5.0
+
+    def __init__(self, data_dir: str):
+        """
+        初始化 JSON 文件后端
+
+        Args:
+            data_dir: 数据文件目录路径
+        """
+        self.data_dir = data_dir
+        self._manifest = None
+
+    def get_file_path(self, date: str) -> str:
+        """获取指定日期的数据文件路径"""
+        return os.path.join(self.data_dir, f"timedata_{date}.json")
+
+    @property
+    def manifest(self) -> DateManifest:
+        """数据目录清单，首次使用时加载"""
+        if self._manifest is None:
+            self._manifest = DateManifest(self.data_dir)
+        return self._manifest
+
+    def __getstate__(self):
+        # 清单带有线程锁，不随对象跨进程传递
+        return {'data_dir': self.data_dir}
+
+    def __setstate__(self, state):
+        self.data_dir = state['data_dir']
+        self._manifest = None
+
+    def list_dates(self) -> List[str]:
+        return self.manifest.dates
+
+    def recent_dates(self, days: int) -> List[str]:
+        return self.manifest.recent(days)
+
+    def dates_between(self, start_date: str, end_date: str) -> List[str]:
+        return self.manifest.dates_between(start_date, end_date)
+
+    def day_version(self, date: str) -> Optional[Hashable]:
+        # 版本号覆盖本程序的所有写入（包括追加日志），快照文件的 os.stat 覆盖手动编辑
+        file_path = self.get_file_path(date)
+        counter = read_version(file_path)
+        try:
+            st = os.stat(file_path)
+            snapshot = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            snapshot = None
+            if counter == 0 and not os.path.exists(get_journal_path(file_path)):
+                return None
+        return (counter, snapshot)
+
+    def day_counter(self, date: str) -> int:
+        return read_version(self.get_file_path(date))
+
+    def change_token(self) -> Optional[Hashable]:
+        # 快照替换、日志的创建与改名都会改变目录的修改时间，一次 os.stat 即可；
+        # 刚修改过的目录（同一时间粒度内可能还有写入）不可信
+        try:
+            mtime_ns = os.stat(self.data_dir).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if time.time_ns() - mtime_ns < 2_000_000_000:
+            return None
+        return mtime_ns
+
+    def load_day(self, date: str) -> List[Dict]:
+        file_path = self.get_file_path(date)
+
+        # 不存在的日期同样在版本号校验之内判断：压缩期间快照可能尚未生成，日志已改名为 .compacting
+        # 类似 seqlock 的无锁读取：快照文件 + 尚未压缩的追加日志，只返回前后版本号一致且为偶数时读到的数据，
+        # 否则退避后重读；超时仍读不到一致的数据时抛出 TimeoutError，不返回未经校验的结果
+        deadline = time.monotonic() + self.READ_TIMEOUT
+        delay = 0.001
+        decode_errors = 0
+        while True:
+            before = read_version(file_path)
+            if before % 2 == 0 or self._write_abandoned(file_path):
+                try:
+                    data = load_with_journal(file_path)
+                except json.JSONDecodeError:
+                    # 外部程序非原子地写入时可能读到写了一半的快照
+                    decode_errors += 1
+                    if decode_errors >= self.READ_RETRIES and read_version(file_path) == before:
+                        raise
+                    data = None
+                if data is not None and read_version(file_path) == before:
+                    return data
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"{self.READ_TIMEOUT} 秒内未能读到 {date} 的一致数据")
+            registry.add('storage.read_retries')
+            time.sleep(delay)
+            delay = min(delay * 2, self.READ_BACKOFF_MAX)
+
+    def _write_abandoned(self, file_path: str) -> bool:
+        """版本号为奇数时，判断写入方是否已在中途崩溃（版本号长时间没有变化）"""
+        try:
+            return time.time() - os.stat(get_version_path(file_path)).st_mtime >= self.STALE_WRITE_SECONDS
+        except FileNotFoundError:
+            return False
+
+    def save_day(self, date: str, data: List[Dict]):
+        # 临时文件 + os.replace，写到一半崩溃也不会留下损坏的快照
+        # data 是整天的数据（调用方读取时已包含日志中的记录），替换快照后删除日志，避免记录被重复合并；
+        # 期间版本号为奇数，读者不会读到新快照与旧日志的组合
+        file_path = self.get_file_path(date)
+        journal_path = get_journal_path(file_path)
+        bump_version(file_path, 2 if read_version(file_path) % 2 else 1)
+        try:
+            write_json_atomic(file_path, data)
+            for path in (journal_path, journal_path + ".compacting", get_marker_path(journal_path)):
+                if os.path.exists(path):
+                    os.remove(path)
+        finally:
+            bump_version(file_path, 1)
+
+
+class SqliteBackend(StorageBackend):
+    """SQLite 存储后端：所有日期保存在同一个数据库中，按 (date, seconds) 建索引"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS anchors (
+            date    TEXT    NOT NULL,
+            seconds INTEGER NOT NULL,
+            seq     INTEGER NOT NULL,
+            time    TEXT    NOT NULL,
+            event   TEXT    NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_anchors_date_seconds ON anchors (date, seconds);
+        CREATE TABLE IF NOT EXISTS day_versions (
+            date    TEXT    PRIMARY KEY,
+            version INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, db_path: str):
+        """
+        初始化 SQLite 后端
+
+        Args:
+            db_path: 数据库文件路径
+        """
+        self.db_path = db_path
+        self._local = threading.local()  # Dash 以多线程方式处理回调，每个线程一个连接
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def __getstate__(self):
+        # 数据库连接不能跨进程传递，子进程中按需重新连接
+        return {'db_path': self.db_path}
+
+    def __setstate__(self, state):
+        self.db_path = state['db_path']
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def list_dates(self) -> List[str]:
+        rows = self._connect().execute(
+            "SELECT DISTINCT date FROM anchors ORDER BY date"
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def recent_dates(self, days: int) -> List[str]:
+        if days <= 0:
+            return []
+        rows = self._connect().execute(
+            "SELECT DISTINCT date FROM anchors ORDER BY date DESC LIMIT ?", (days,)
+        ).fetchall()
+        return [row[0] for row in reversed(rows)]
+
+    def dates_between(self, start_date: str, end_date: str) -> List[str]:
+        rows = self._connect().execute(
+            "SELECT DISTINCT date FROM anchors WHERE date BETWEEN ? AND ? ORDER BY date",
+            (start_date, end_date)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def day_version(self, date: str) -> Optional[Hashable]:
+        row = self._connect().execute(
+            "SELECT version FROM day_versions WHERE date = ?", (date,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def day_counter(self, date: str) -> int:
+        # 版本号与数据在同一事务中更新，读取本身就是一致的
+        return self.day_version(date) or 0
+
+    def change_token(self) -> Optional[Hashable]:
+        # 每次写入都在同一事务中递增该天的版本号
+        return tuple(self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(version), 0) FROM day_versions"
+        ).fetchone())
+
+    def _bump_version(self, conn: sqlite3.Connection, date: str):
+        """在当前事务中递增某一天的版本号"""
+        conn.execute(
+            "INSERT INTO day_versions (date, version) VALUES (?, 1) "
+            "ON CONFLICT(date) DO UPDATE SET version = version + 1", (date,)
+        )
+
+    def load_day(self, date: str) -> List[Dict]:
+        rows = self._connect().execute(
+            "SELECT time, event FROM anchors WHERE date = ? ORDER BY seconds, seq", (date,)
+        ).fetchall()
+        registry.add('storage.rows_read', len(rows))
+        return [{'time': time, 'event': event} for time, event in rows]
+
+    def load_range(self, start_date: str, end_date: str) -> Dict[str, List[Dict]]:
+        rows = self._connect().execute(
+            "SELECT date, time, event FROM anchors WHERE date BETWEEN ? AND ? "
+            "ORDER BY date, seconds, seq", (start_date, end_date)
+        ).fetchall()
+        registry.add('storage.rows_read', len(rows))
+        result = {}
+        for date, time, event in rows:
+            result.setdefault(date, []).append({'time': time, 'event': event})
+        return result
+
+    def save_day(self, date: str, data: List[Dict]):
+        rows = [(date, time_to_seconds(item['time']), seq, item['time'], item['event'])
+                for seq, item in enumerate(data)]
+        with self._connect() as conn:
+            conn.execute("DELETE FROM anchors WHERE date = ?", (date,))
+            conn.executemany(
+                "INSERT INTO anchors (date, seconds, seq, time, event) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._bump_version(conn, date)
+
+    def append_event(self, date: str, record: Dict):
+        """
+        追加一条锚点记录
+
+        Args:
+            date: 日期字符串
+            record: 记录，包含 time 和 event
+        """
+        with self._connect() as conn:
+            seq = conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM anchors WHERE date = ?", (date,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO anchors (date, seconds, seq, time, event) VALUES (?, ?, ?, ?, ?)",
+                (date, time_to_seconds(record['time']), seq, record['time'], record['event'])
+            )
+            self._bump_version(conn, date)
+
+
+def migrate_json_to_sqlite(data_dir: str, db_path: str) -> int:
+    """
+    把 JSON 数据目录一次性导入 SQLite 数据库
+
+    Args:
+        data_dir: JSON 数据文件目录
+        db_path: 目标数据库文件路径
+
+    Returns:
+        导入的天数
+    """
+    source = JsonFileBackend(data_dir)
+    target = SqliteBackend(db_path)
+    count = 0
+    for date in source.list_dates():
+        try:
+            target.save_day(date, source.load_day(date))
+            count += 1
+        except (json.JSONDecodeError, ValueError, KeyError) as e:
+            print(f"迁移 {date} 的数据时出错: {e}")
+    return count
+
+
+def export_sqlite_to_json(db_path: str, data_dir: str) -> int:
+    """
+    把 SQLite 数据库导出为每天一个 JSON 文件
+
+    Args:
+        db_path: 数据库文件路径
+        data_dir: 导出目录
+
+    Returns:
+        导出的天数
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    source = SqliteBackend(db_path)
+    target = JsonFileBackend(data_dir)
+    dates = source.list_dates()
+    for date in dates:
+        target.save_day(date, source.load_day(date))
+    return len(dates)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from storage import get_data_dir
+
+    parser = argparse.ArgumentParser(description="时间数据存储迁移工具")
+    parser.add_argument("command", choices=["migrate", "export"],
+                        help="migrate: JSON -> SQLite；export: SQLite -> JSON")
+    parser.add_argument("--data-dir", default=None, help="JSON 数据目录，默认为统一的数据根目录")
+    parser.add_argument("--db", default=None, help="SQLite 数据库路径，默认为数据目录下的 timedata.db")
+    args = parser.parse_args()
+    args.data_dir = args.data_dir or get_data_dir()
+    args.db = args.db or os.path.join(args.data_dir, "timedata.db")
+
+    if args.command == "migrate":
+        print(f"已导入 {migrate_json_to_sqlite(args.data_dir, args.db)} 天的数据到 {args.db}")
+    else:
+        print(f"已导出 {export_sqlite_to_json(args.db, args.data_dir)} 天的数据到 {args.data_dir}")
@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_journal import EventJournal
+from storage import StorageEngine
+from storage_backends import JsonFileBackend
+
+DATE = '2025-07-04'
+EVENTS = 2000
+
+
+def write_day(data_dir: str, events: int, compact_every: int):
+    """写入进程：逐条追加事件 e0, e1, ...，并频繁压缩日志"""
+    engine = StorageEngine(data_dir)
+    journal = EventJournal(engine.get_day_file(DATE), fsync=False, compact_delay=3600)
+    for i in range(events):
+        journal.append({'time': '08:00:00', 'event': f"e{i}"})
+        if i % compact_every == 0:
+            journal.compact()
+    journal.cancel()
+    journal.compact()
+
+
+class SeqlockReadTest(unittest.TestCase):
+    """另一个进程追加并压缩日志时，并发读取只能得到连续的前缀：不缺记录、不重复、不回退"""
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def test_reads_are_contiguous_prefixes(self):
+        backend = JsonFileBackend(self.data_dir)
+        writer = multiprocessing.Process(target=write_day, args=(self.data_dir, EVENTS, 3))
+        failures = []
+        lengths = []
+
+        def read_day():
+            last = 0
+            while writer.is_alive() or not lengths:
+                events = [record['event'] for record in backend.load_day(DATE)]
+                if events != [f"e{i}" for i in range(len(events))]:
+                    failures.append(f"读到的不是连续前缀: {len(events)} 条")
+                elif len(events) < last:
+                    failures.append(f"记录数回退: {last} -> {len(events)}")
+                last = len(events)
+                lengths.append(last)
+
+        writer.start()
+        readers = [threading.Thread(target=read_day) for _ in range(3)]
+        for reader in readers:
+            reader.start()
+        writer.join(120)
+        for reader in readers:
+            reader.join(30)
+
+        self.assertEqual(writer.exitcode, 0)
+        self.assertEqual(failures[:5], [])
+        self.assertEqual([record['event'] for record in backend.load_day(DATE)],
+                         [f"e{i}" for i in range(EVENTS)])
+
+    def test_abandoned_compaction_is_readable(self):
+        # 压缩在改名之后崩溃：版本号停留在奇数，读者在写入方被判定为已崩溃后仍能读到完整数据
+        backend = JsonFileBackend(self.data_dir)
+        backend.STALE_WRITE_SECONDS = 0.2
+        journal = EventJournal(backend.get_file_path(DATE), fsync=False, compact_delay=3600)
+        for i in range(5):
+            journal.append({'time': '08:00:00', 'event': f"e{i}"})
+        journal.cancel()
+        journal_path = journal.journal_path
+        os.replace(journal_path, journal_path + ".compacting")
+        with open(journal_path.replace('.journal', '.version'), 'ab') as f:
+            f.write(b'\n')
+
+        start = time.monotonic()
+        events = [record['event'] for record in backend.load_day(DATE)]
+        self.assertEqual(events, [f"e{i}" for i in range(5)])
+        self.assertLess(time.monotonic() - start, backend.READ_TIMEOUT)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,250 @@
+import os
+import signal
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QKeySequence
+from PyQt5.QtWidgets import QShortcut
+
+# 设置该环境变量即启用诊断模式：值为 1 时日志写到临时目录，否则视为日志文件路径
+DIAGNOSTICS_ENV = 'TIMETABLE_DIAGNOSTICS'
+DUMP_HOTKEY = 'Ctrl+Shift+D'
+
+
+def resident_memory() -> Optional[int]:
+    """
+    获取当前进程的常驻内存（字节），无法获取时返回 None
+
+    Returns:
+        常驻内存字节数
+    """
+    if sys.platform.startswith('linux'):
+        try:
+            with open('/proc/self/statm', 'r') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            return None
+    if os.name == 'nt':
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+        return None
+    try:
+        import resource
+        # macOS 上 ru_maxrss 以字节为单位，这里是峰值而不是当前值
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except (ImportError, OSError):
+        return None
+
+
+class CallStats:
+    """某个被测函数在一个统计周期内的调用次数、耗时和净分配"""
+
+    __slots__ = ('calls', 'total_ms', 'max_ms', 'blocks', 'bytes')
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.blocks = 0
+        self.bytes = 0
+
+    def format(self, label: str) -> str:
+        if not self.calls:
+            return f"{label} calls=0"
+        return (f"{label} calls={self.calls} avg={self.total_ms / self.calls:.3f}ms max={self.max_ms:.3f}ms "
+                f"blocks/call={self.blocks / self.calls:+.1f} bytes/call={self.bytes / self.calls:+.0f}")
+
+
+class WidgetDiagnostics:
+    """
+    时钟窗口诊断模式 - 长时间运行时定位内存泄漏和多余的定时唤醒，无需附加调试器
+
+    统计重绘、指针定时器、悬停检测和日期检查每次调用的耗时与净分配（内存块数和字节数），
+    每个统计周期写一行滚动日志（含常驻内存）；每隔较长时间拍一次 tracemalloc 快照，
+    记录相对上一次快照增长最多的代码行。按热键或发送 SIGUSR1 时把滚动日志写入文件。
+    """
+
+    def __init__(self, log_path: str, report_interval: float = 60.0, snapshot_interval: float = 600.0,
+                 history: int = 2000, trace_frames: int = 5, top_lines: int = 10):
+        """
+        初始化诊断模式
+
+        Args:
+            log_path: 滚动日志的转储文件
+            report_interval: 统计周期（秒），每个周期写一行日志
+            snapshot_interval: tracemalloc 快照间隔（秒）
+            history: 滚动日志保留的行数
+            trace_frames: tracemalloc 为每次分配保存的栈帧数
+            top_lines: 每次快照记录的增长最多的代码行数
+        """
+        self.log_path = log_path
+        self.report_interval = report_interval
+        self.snapshot_interval = snapshot_interval
+        self.trace_frames = trace_frames
+        self.top_lines = top_lines
+
+        self.log = deque(maxlen=history)
+        self.stats: Dict[str, CallStats] = {}
+        self._baseline = None
+        self._previous = None
+        self._overhead = (0, 0)  # 统计本身每次调用产生的净分配（块数, 字节数）
+        self._timers = []
+        self._shortcut = None
+
+    @classmethod
+    def from_env(cls) -> Optional['WidgetDiagnostics']:
+        """
+        按环境变量创建诊断模式，未启用时返回 None
+
+        Returns:
+            WidgetDiagnostics 实例或 None
+        """
+        value = os.environ.get(DIAGNOSTICS_ENV, '').strip()
+        if value in ('', '0'):
+            return None
+        if value == '1':
+            value = os.path.join(tempfile.gettempdir(), 'timetable_diagnostics.log')
+        return cls(value)
+
+    def install(self, window):
+        """
+        在时钟窗口上启用诊断：包装被测函数，启动统计定时器，注册热键和信号
+
+        Args:
+            window: ClockWindow 实例（需在其定时器创建之后调用）
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+        self._calibrate()
+
+        controller = window.controller
+        self._wrap(window, 'paintEvent', 'paint')
+        self._wrap(window, 'on_tick', 'tick', timer=window.timer)
+        self._wrap(controller, '_do_hover_detection', 'hover')
+        self._wrap(controller, '_check_date_change', 'date_check', timer=controller.date_check_timer)
+
+        for interval, callback in ((self.report_interval, self.report),
+                                   (self.snapshot_interval, self.take_snapshot)):
+            timer = QTimer(window)
+            timer.timeout.connect(callback)
+            timer.start(int(interval * 1000))
+            self._timers.append(timer)
+
+        self._shortcut = QShortcut(QKeySequence(DUMP_HOTKEY), window)
+        self._shortcut.activated.connect(self.dump)
+        if hasattr(signal, 'SIGUSR1'):
+            # Python 的信号处理函数在解释器执行下一条字节码时运行，指针定时器保证每秒至少有一次
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.dump())
+
+        self.take_snapshot()
+        self._append(f"诊断模式已启用，按 {DUMP_HOTKEY} 或发送 SIGUSR1 转储到 {self.log_path}")
+        print(f"时钟窗口诊断模式已启用，日志转储文件: {self.log_path}")
+
+    def _calibrate(self, rounds: int = 20):
+        """测量包装函数在空调用时的净分配，统计时扣除"""
+        stats = CallStats()
+        wrapper = self._make_wrapper(lambda: None, stats, (0, 0))
+        for _ in range(rounds):
+            wrapper()
+        self._overhead = (round(stats.blocks / rounds), round(stats.bytes / rounds))
+
+    def _make_wrapper(self, original, stats: CallStats, overhead):
+        """生成记录耗时和净分配的包装函数"""
+        overhead_blocks, overhead_bytes = overhead
+
+        def wrapper(*args, **kwargs):
+            blocks = sys.getallocatedblocks()
+            traced = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = (time.perf_counter() - start) * 1000
+                stats.calls += 1
+                stats.total_ms += elapsed
+                if elapsed > stats.max_ms:
+                    stats.max_ms = elapsed
+                stats.blocks += sys.getallocatedblocks() - blocks - overhead_blocks
+                stats.bytes += tracemalloc.get_traced_memory()[0] - traced - overhead_bytes
+
+        return wrapper
+
+    def _wrap(self, owner, name: str, label: str, timer: Optional[QTimer] = None):
+        """
+        用计时和分配统计包装 owner.name，已连接到 timer 的旧方法改为连接包装后的方法
+
+        实例属性会覆盖类中的方法，PyQt 派发虚函数（如 paintEvent）时同样使用实例属性。
+        """
+        original = getattr(owner, name)
+        wrapper = self._make_wrapper(original, self.stats.setdefault(label, CallStats()), self._overhead)
+        setattr(owner, name, wrapper)
+        if timer is not None:
+            timer.timeout.disconnect(original)
+            timer.timeout.connect(wrapper)
+
+    def _append(self, line: str):
+        """追加一行带时间戳的日志"""
+        self.log.append(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} {line}")
+
+    def report(self):
+        """写一行本统计周期的汇总，并开始新的周期"""
+        rss = resident_memory()
+        traced, peak = tracemalloc.get_traced_memory()
+        parts = [
+            f"rss={rss / 1048576:.1f}MB" if rss is not None else "rss=?",
+            f"traced={traced / 1048576:.2f}MB peak={peak / 1048576:.2f}MB",
+            f"blocks={sys.getallocatedblocks()}",
+        ]
+        for label in list(self.stats):
+            parts.append(self.stats[label].format(label))
+            self.stats[label].__init__()
+        self._append(' | '.join(parts))
+
+    def take_snapshot(self):
+        """拍一次 tracemalloc 快照，记录相对上一次快照增长最多的代码行"""
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        if self._baseline is None:
+            self._baseline = snapshot
+        if self._previous is not None:
+            growth = [stat for stat in snapshot.compare_to(self._previous, 'lineno') if stat.size_diff > 0]
+            total = sum(stat.size_diff for stat in snapshot.compare_to(self._baseline, 'filename'))
+            self._append(f"快照：自启用以来净增长 {total / 1024:+.1f}KB，本周期增长最多的代码行：")
+            for stat in growth[:self.top_lines]:
+                frame = stat.traceback[0]
+                self._append(f"    {frame.filename}:{frame.lineno} {stat.size_diff / 1024:+.1f}KB "
+                             f"({stat.count_diff:+d} 块)")
+        self._previous = snapshot
+
+    def dump(self):
+        """把当前周期的汇总和滚动日志写入转储文件"""
+        self.report()
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+            with open(self.log_path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(self.log) + '\n')
+            print(f"诊断日志已写入: {self.log_path}")
+        except OSError as e:
+            print(f"写入诊断日志时出错: {e}")